@@ -1,15 +1,1749 @@
 import sys
 import argparse
-from PyQt5.QtWidgets import QApplication, QMainWindow, QFileDialog, QLabel, QVBoxLayout, QHBoxLayout, QSpacerItem, QSizePolicy, QWidget, QPushButton, QLineEdit, QListWidget, QTextEdit, QMessageBox, QDialog, QScrollArea, QShortcut, QAction, QInputDialog
+from PyQt5.QtWidgets import QApplication, QMainWindow, QFileDialog, QLabel, QVBoxLayout, QHBoxLayout, QSpacerItem, QSizePolicy, QWidget, QPushButton, QLineEdit, QListWidget, QTableView, QHeaderView, QAbstractItemView, QTextEdit, QMessageBox, QDialog, QScrollArea, QShortcut, QAction, QInputDialog, QProgressDialog
 from PyQt5.QtGui import QImage, QPixmap, QKeySequence, QDesktopServices, QTextCursor, QTextCharFormat, QColor
-from PyQt5.QtCore import Qt, QUrl
+from PyQt5.QtCore import Qt, QUrl, QObject, QThread, pyqtSignal, QItemSelection, QItemSelectionModel, QAbstractTableModel, QModelIndex, QPoint
 import os
 import platform
-from PIL import Image  # Add this import at the top of your file
+from PIL import Image, ImageOps  # Add this import at the top of your file
 import re  # Add at top with other imports
+import asyncio
+import hashlib
+import hmac
+import io
+import json
+import math
+import multiprocessing
+import secrets
+import shutil
+import socket
+import subprocess
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg']
+# Formats the editor offers to convert to one of IMAGE_EXTENSIONS
+CONVERTIBLE_IMAGE_EXTENSIONS = ['.bmp', '.webp']
+
+# Optional per-folder sidecar database, only used when present in the folder
+PROJECT_DB_NAME = ".caption_editor.db"
+
+# Per-folder snapshot store taken before bulk operations, pruned to these defaults
+SNAPSHOT_DIR_NAME = ".caption_snapshots"
+SNAPSHOT_MAX_BYTES = 500 * 1024 * 1024
+SNAPSHOT_MAX_AGE_DAYS = 30
+
+# Where the automation API writes its access token, readable only by the user running the editor
+API_TOKEN_PATH = os.path.join(os.path.expanduser("~"), ".caption_editor_api_token")
+
+
+def natural_sort_key(s):
+    """Sort strings containing numbers in human order.
+
+    The key is a plain string so the project database can store and ORDER BY it: each run of digits
+    becomes its length and value (compared by number), and parts are joined by '\\x01', which sorts
+    before any printable character so 'a' still comes before 'a1' and 'a1' before 'a!'.
+    """
+    parts = re.split('([0-9]+)', s.lower())
+    for index in range(1, len(parts), 2):
+        digits = parts[index].lstrip('0')
+        parts[index] = f"{len(digits):04d}{digits}"
+    return '\x01'.join(parts)
+
+
+# Filesystem types where SQLite's WAL mode is unsafe, since it needs shared memory between processes
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'afpfs', 'afs', '9p', 'ncpfs', 'davfs',
+                       'webdav', 'sshfs', 'fuse.sshfs', 'fuse.rclone'}
+
+
+def is_network_filesystem(path):
+    """Best-effort check whether path is on a network mount; False when it cannot be told"""
+    path = os.path.realpath(path)
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            drive = os.path.splitdrive(path)[0]
+            if drive.startswith('\\\\'):
+                return True  # UNC path
+            return ctypes.windll.kernel32.GetDriveTypeW(drive + '\\') == 4  # DRIVE_REMOTE
+        if sys.platform.startswith('linux'):
+            with open('/proc/mounts') as file:
+                mounts = [(fields[1].replace('\\040', ' '), fields[2])
+                          for fields in (line.split() for line in file) if len(fields) >= 3]
+        else:
+            # macOS and BSD print "server:/export on /Volumes/share (nfs, nodev, ...)"
+            output = subprocess.run(['mount'], capture_output=True, text=True, timeout=5).stdout
+            mounts = re.findall(r' on (.+) \(([\w.]+)', output)
+    except (OSError, subprocess.SubprocessError, AttributeError):
+        return False
+
+    # The longest mount point containing path is the filesystem it lives on
+    containing = [(mount_point, fs_type) for mount_point, fs_type in mounts
+                  if path == mount_point or path.startswith(mount_point.rstrip(os.sep) + os.sep)]
+    if not containing:
+        return False
+    return max(containing, key=lambda mount: len(mount[0]))[1].lower() in NETWORK_FILESYSTEMS
+
+
+def format_file_size(num_bytes):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if num_bytes < 1024 or unit == 'GB':
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+
+def read_metadata_entry(folder_path, text_name, image_name, fs):
+    """Read image header and caption for one file through fs (runs in a worker thread)"""
+    entry = {'width': None, 'height': None, 'aspect': None, 'megapixels': None, 'format': None,
+             'caption_length': None, 'caption_hash': None, 'caption': None}
+
+    if image_name:
+        try:
+            # Image.open is lazy: it only parses the header, pixels are never decoded here
+            with fs.open(os.path.join(folder_path, image_name)) as file, Image.open(file) as img:
+                width, height = img.size
+                entry['width'] = width
+                entry['height'] = height
+                entry['aspect'] = round(width / height, 3) if height else None
+                entry['megapixels'] = round(width * height / 1_000_000, 2)
+                entry['format'] = img.format
+        except Exception as e:
+            print(f"Failed to read image header for {image_name}: {e}")
+
+    try:
+        data = fs.read_bytes(os.path.join(folder_path, text_name))
+        entry['caption_hash'] = hashlib.sha256(data).hexdigest()
+        entry['caption'] = data.decode('utf-8', errors='replace')
+        entry['caption_length'] = len(entry['caption'])
+    except Exception as e:
+        print(f"Failed to read caption {text_name}: {e}")
+
+    return entry
+
+
+class ImageMetadataIndex:
+    """Metadata for every caption file in a folder, cached by mtime/size of the caption and image"""
+
+    # (header, entry key) for the file list columns
+    COLUMNS = [
+        ("Name", 'sort_key'),
+        ("Width", 'width'),
+        ("Height", 'height'),
+        ("Aspect", 'aspect'),
+        ("MP", 'megapixels'),
+        ("Format", 'format'),
+        ("Size", 'file_size'),
+        ("Caption", 'caption_length'),
+        ("Lint", 'lint'),
+    ]
+
+    # Names accepted in the metadata filter, e.g. "width<512 format=png" or "lint=duplicate_tags"
+    FILTER_KEYS = {
+        'width': 'width',
+        'height': 'height',
+        'aspect': 'aspect',
+        'mp': 'megapixels',
+        'format': 'format',
+        'size': 'file_size',
+        'caption': 'caption_length',
+        'lint': 'lint',
+    }
+
+    FILTER_PATTERN = re.compile(r'(\w+)\s*(<=|>=|!=|=|<|>)\s*([\w.]+)')
+    SIZE_SUFFIXES = {'kb': 1024, 'mb': 1024 ** 2, 'gb': 1024 ** 3}
+
+    def __init__(self, max_workers=None, fs=None):
+        self.entries = {}
+        self.max_workers = max_workers
+        self.fs = fs or LocalFileSystem()
+
+    def refresh(self, folder_path, stats=None):
+        """Bring the index up to date with the folder's captions, re-reading only files whose mtime/size changed.
+
+        stats is the folder listing from scandir_stats, listed here when not given.
+        Returns a dict of caption text for the files that were re-read.
+        """
+        if stats is None:
+            stats = self.fs.scandir_stats(folder_path)
+
+        entries = {}
+        pending = []
+        for text_name in [name for name in stats if name.endswith(".txt")]:
+            # Plain loop and slicing rather than splitext and a generator: this runs once per file on every open
+            base_name = text_name[:-len('.txt')]
+            for ext in IMAGE_EXTENSIONS:
+                image_name = base_name + ext
+                if image_name in stats:
+                    break
+            else:
+                image_name = None
+            stamp = (stats.get(text_name), image_name, stats.get(image_name))
+
+            cached = self.entries.get(text_name)
+            if cached and cached['stamp'] == stamp:
+                entries[text_name] = cached
+                continue
+
+            entry = {
+                'name': text_name,
+                'sort_key': cached['sort_key'] if cached else natural_sort_key(text_name),
+                'image_name': image_name,
+                'file_size': stats[image_name][1] if image_name else None,
+                'stamp': stamp,
+            }
+            entries[text_name] = entry
+            pending.append(entry)
+
+        changed_captions = {}
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = executor.map(lambda e: read_metadata_entry(folder_path, e['name'], e['image_name'], self.fs), pending)
+                for entry, metadata in zip(pending, results):
+                    # Caption text is handed back to the caller rather than kept in memory
+                    changed_captions[entry['name']] = metadata.pop('caption')
+                    entry.update(metadata)
+
+        self.entries = entries
+        return changed_captions
+
+    def update_captions(self, updates):
+        """Apply results from edit_captions to the cached entries without re-reading any file"""
+        for name, update in updates.items():
+            entry = self.entries.get(name)
+            if not entry:
+                continue
+            _, image_name, image_stat = entry['stamp']
+            entry['stamp'] = (update['text_stat'], image_name, image_stat)
+            entry['caption_length'] = len(update['caption'])
+            entry['caption_hash'] = update['caption_hash']
+
+    def clear(self):
+        self.entries = {}
+
+    def parse_filter(self, filter_text):
+        """Parse 'key<op>value' clauses into (entry key, op, value) tuples, raising ValueError on bad input"""
+        clauses = []
+        remainder = self.FILTER_PATTERN.sub('', filter_text).replace(',', ' ').strip()
+        if remainder:
+            raise ValueError(f"Could not parse '{remainder}'")
+
+        for key, op, value in self.FILTER_PATTERN.findall(filter_text):
+            key = key.lower()
+            if key not in self.FILTER_KEYS:
+                raise ValueError(f"Unknown filter key '{key}'")
+            entry_key = self.FILTER_KEYS[key]
+
+            if entry_key == 'format':
+                if op not in ('=', '!='):
+                    raise ValueError("Format only supports = and !=")
+                # Pillow calls JPEG files 'JPEG', but people filter by the extension
+                value = {'JPG': 'JPEG'}.get(value.upper(), value.upper())
+            elif entry_key == 'lint':
+                if op not in ('=', '!='):
+                    raise ValueError("Lint only supports = and !=")
+                value = value.lower()
+                if value != 'any' and value not in LINT_RULES:
+                    raise ValueError(f"Unknown lint rule '{value}'")
+            else:
+                multiplier = 1
+                suffix = value[-2:].lower()
+                if entry_key == 'file_size' and suffix in self.SIZE_SUFFIXES:
+                    multiplier = self.SIZE_SUFFIXES[suffix]
+                    value = value[:-2]
+                value = float(value) * multiplier
+            clauses.append((entry_key, op, value))
+        return clauses
+
+    @staticmethod
+    def matches(entry, clauses):
+        for entry_key, op, value in clauses:
+            actual = entry.get(entry_key)
+            if actual is None:
+                return False
+            if entry_key == 'format':
+                actual = actual.upper()
+            if entry_key == 'lint':
+                # 'any' matches files with at least one finding, otherwise match one rule code
+                found = bool(actual) if value == 'any' else value in actual
+                if found != (op == '='):
+                    return False
+                continue
+            if op == '<' and not actual < value:
+                return False
+            if op == '<=' and not actual <= value:
+                return False
+            if op == '>' and not actual > value:
+                return False
+            if op == '>=' and not actual >= value:
+                return False
+            if op == '=' and not actual == value:
+                return False
+            if op == '!=' and not actual != value:
+                return False
+        return True
+
+
+class ProjectDatabase:
+    """SQLite sidecar storing captions, hashes, mtimes and image metadata with an FTS5 caption index"""
+
+    METADATA_COLUMNS = ['image_name', 'width', 'height', 'aspect', 'megapixels', 'format',
+                        'file_size', 'caption_length', 'caption_hash']
+
+    # Bumped when stored values change meaning; 1 stores sort keys as strings instead of JSON lists
+    SCHEMA_VERSION = 1
+
+    def __init__(self, folder_path):
+        self.path = os.path.join(folder_path, PROJECT_DB_NAME)
+        self.connection = sqlite3.connect(self.path)
+        # WAL lets the list read while an update is written, but SQLite documents it as broken on
+        # network filesystems, so datasets on NFS/SMB shares keep the rollback journal
+        journal_mode = 'DELETE' if is_network_filesystem(folder_path) else 'WAL'
+        self.connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.trigram = True
+        self.create_schema()
+
+    @staticmethod
+    def exists(folder_path):
+        return os.path.isfile(os.path.join(folder_path, PROJECT_DB_NAME))
+
+    def create_schema(self):
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT UNIQUE NOT NULL,
+                    caption TEXT NOT NULL DEFAULT '',
+                    caption_hash TEXT,
+                    caption_length INTEGER,
+                    text_mtime REAL,
+                    text_size INTEGER,
+                    image_name TEXT,
+                    image_mtime REAL,
+                    image_size INTEGER,
+                    width INTEGER,
+                    height INTEGER,
+                    aspect REAL,
+                    megapixels REAL,
+                    format TEXT,
+                    file_size INTEGER,
+                    sort_key TEXT
+                )""")
+            # Databases created before sort keys were stored get the column added
+            columns = {row[1] for row in self.connection.execute("PRAGMA table_info(files)")}
+            if 'sort_key' not in columns:
+                self.connection.execute("ALTER TABLE files ADD COLUMN sort_key TEXT")
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+                rows = self.connection.execute("SELECT id, name FROM files").fetchall()
+                self.connection.executemany("UPDATE files SET sort_key = ? WHERE id = ?",
+                                            [(natural_sort_key(name), row_id) for row_id, name in rows])
+                self.connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            # Covers the query that lists the rows in name order, so the file list never reads the table for it
+            self.connection.execute("CREATE INDEX IF NOT EXISTS files_by_sort_key ON files(sort_key, name)")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS edit_log (
+                    id INTEGER PRIMARY KEY,
+                    timestamp REAL NOT NULL,
+                    operation TEXT NOT NULL,
+                    details TEXT,
+                    file_count INTEGER NOT NULL
+                )""")
+
+            # The trigram tokenizer gives substring matching like the plain search does;
+            # older SQLite builds fall back to the default word tokenizer
+            try:
+                self.connection.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS captions_fts
+                    USING fts5(caption, content='files', content_rowid='id', tokenize='trigram')""")
+            except sqlite3.OperationalError:
+                self.trigram = False
+                self.connection.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS captions_fts
+                    USING fts5(caption, content='files', content_rowid='id')""")
+
+            # Keep the external content FTS index in step with the files table
+            self.connection.executescript("""
+                CREATE TRIGGER IF NOT EXISTS files_ai AFTER INSERT ON files BEGIN
+                    INSERT INTO captions_fts(rowid, caption) VALUES (new.id, new.caption);
+                END;
+                CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN
+                    INSERT INTO captions_fts(captions_fts, rowid, caption) VALUES ('delete', old.id, old.caption);
+                END;
+                CREATE TRIGGER IF NOT EXISTS files_au AFTER UPDATE OF caption ON files BEGIN
+                    INSERT INTO captions_fts(captions_fts, rowid, caption) VALUES ('delete', old.id, old.caption);
+                    INSERT INTO captions_fts(rowid, caption) VALUES (new.id, new.caption);
+                END;
+            """)
+
+    def select_entries(self, where="", parameters=()):
+        """Yield (id, metadata index entry) for stored files, without touching the caption files"""
+        cursor = self.connection.execute(
+            f"SELECT id, name, sort_key, text_mtime, text_size, image_mtime, image_size, "
+            f"{', '.join(self.METADATA_COLUMNS)} FROM files {where}", parameters)
+        for row in cursor:
+            row_id, name, sort_key, text_mtime, text_size, image_mtime, image_size = row[:7]
+            entry = dict(zip(self.METADATA_COLUMNS, row[7:]))
+            image_stat = (image_mtime, image_size) if entry['image_name'] else None
+            entry['name'] = name
+            entry['sort_key'] = sort_key or natural_sort_key(name)
+            entry['stamp'] = ((text_mtime, text_size), entry['image_name'], image_stat)
+            yield row_id, entry
+
+    def load_entries(self):
+        """Return metadata index entries for every stored file, in name order"""
+        return {entry['name']: entry for _, entry in self.select_entries("ORDER BY sort_key")}
+
+    def sorted_rows(self, key, descending=False):
+        """(id, name) of every stored file, ordered like FileListModel.sorted_entries orders entries"""
+        if key not in self.METADATA_COLUMNS + ['sort_key']:
+            key = 'sort_key'  # Lint findings are not stored, so that column falls back to name order
+        direction = 'DESC' if descending else 'ASC'
+        # Every file has a sort key, so name order comes straight from the index
+        order = f"{key} {direction}" if key == 'sort_key' else f"{key} IS NOT NULL {direction}, {key} {direction}"
+        return self.connection.execute(f"SELECT id, name FROM files ORDER BY {order}").fetchall()
+
+    def entries_by_id(self, row_ids):
+        placeholders = ', '.join('?' * len(row_ids))
+        return dict(self.select_entries(f"WHERE id IN ({placeholders})", tuple(row_ids)))
+
+    def sync(self, entries, changed_captions):
+        """Store re-read files and drop files that no longer exist, in a single transaction"""
+        rows = []
+        for name, caption in changed_captions.items():
+            entry = entries[name]
+            text_stat, _, image_stat = entry['stamp']
+            text_mtime, text_size = text_stat if text_stat else (None, None)
+            image_mtime, image_size = image_stat if image_stat else (None, None)
+            rows.append((name, entry['sort_key'], caption or '', text_mtime, text_size,
+                         image_mtime, image_size) + tuple(entry.get(column) for column in self.METADATA_COLUMNS))
+
+        placeholders = ', '.join('?' * (7 + len(self.METADATA_COLUMNS)))
+        updates = ', '.join(f"{column}=excluded.{column}" for column in
+                            ['sort_key', 'caption', 'text_mtime', 'text_size', 'image_mtime', 'image_size']
+                            + self.METADATA_COLUMNS)
+        with self.connection:
+            if rows:
+                self.connection.executemany(
+                    f"INSERT INTO files (name, sort_key, caption, text_mtime, text_size, image_mtime, image_size, "
+                    f"{', '.join(self.METADATA_COLUMNS)}) VALUES ({placeholders}) "
+                    f"ON CONFLICT(name) DO UPDATE SET {updates}", rows)
+
+            stored = {name for (name,) in self.connection.execute("SELECT name FROM files")}
+            removed = [(name,) for name in stored - set(entries)]
+            if removed:
+                self.connection.executemany("DELETE FROM files WHERE name = ?", removed)
+
+    def record_edit(self, operation, details, captions, entries=None):
+        """Store new caption text for an edit and log it, all in one transaction.
+
+        When the metadata index entries are passed, their hashes and stat values are stored too,
+        so the next open does not need to re-read the edited files.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE files SET caption = ?, caption_length = ? WHERE name = ?",
+                [(caption, len(caption), name) for name, caption in captions.items()])
+            if entries:
+                rows = []
+                for name in captions:
+                    entry = entries.get(name)
+                    if entry and entry['stamp'][0]:
+                        text_mtime, text_size = entry['stamp'][0]
+                        rows.append((entry['caption_hash'], text_mtime, text_size, name))
+                self.connection.executemany(
+                    "UPDATE files SET caption_hash = ?, text_mtime = ?, text_size = ? WHERE name = ?", rows)
+            self.connection.execute(
+                "INSERT INTO edit_log (timestamp, operation, details, file_count) VALUES (?, ?, ?, ?)",
+                (time.time(), operation, details, len(captions)))
+
+    def search(self, text):
+        """Return the names of files whose caption contains text (case-insensitive)"""
+        if self.trigram and len(text) >= 3:
+            query = '"' + text.replace('"', '""') + '"'
+            cursor = self.connection.execute(
+                "SELECT name FROM files WHERE id IN (SELECT rowid FROM captions_fts WHERE captions_fts MATCH ?)",
+                (query,))
+        else:
+            # Too short for trigrams (or no trigram tokenizer): scan the stored captions instead of the disk
+            cursor = self.connection.execute(
+                "SELECT name FROM files WHERE instr(lower(caption), ?) > 0", (text.lower(),))
+        return {name for (name,) in cursor}
+
+    def close(self):
+        self.connection.close()
+
+
+def create_missing_captions(folder_path, stats, fs):
+    """Create an empty caption for every image without one, adding them to the stats listing; returns their names"""
+    created = []
+    for image_file in [f for f in stats if f.lower().endswith(tuple(IMAGE_EXTENSIONS))]:
+        text_file = os.path.splitext(image_file)[0] + ".txt"
+        if text_file not in stats:
+            text_path = os.path.join(folder_path, text_file)
+            fs.write_bytes(text_path, b"")
+            stats[text_file] = fs.stat(text_path)
+            created.append(text_file)
+    return created
+
+
+def index_folder(folder_path, entries, fs, use_database=False, sort_column=0, sort_order=Qt.AscendingOrder,
+                 progress=None, is_cancelled=None):
+    """List a folder and bring a copy of the metadata index up to date with it (runs in a background job).
+
+    entries are the index entries to start from; with use_database and no entries they are loaded from
+    the folder's project database, and re-read files are written back to it, on a connection of this
+    thread's own. Returns the new 'entries', those entries 'sorted' for the file list, the 'stats'
+    listing, the names of 'created' captions and of 'convertible' images, and any 'database_error'.
+    """
+    stats = fs.scandir_stats(folder_path)
+    created = create_missing_captions(folder_path, stats, fs)
+    index = ImageMetadataIndex(fs=fs)
+    database_error = None
+    database = ProjectDatabase(folder_path) if use_database else None
+    try:
+        # refresh builds a new dict and never changes cached entries, so the UI keeps using its own meanwhile
+        index.entries = entries if entries or not database else database.load_entries()
+        changed_captions = index.refresh(folder_path, stats)
+        if database:
+            try:
+                database.sync(index.entries, changed_captions)
+            except sqlite3.Error as e:
+                database_error = str(e)
+    finally:
+        if database:
+            database.close()
+    # Everything that walks the whole folder is done here rather than on the UI thread
+    return {
+        'entries': index.entries,
+        'sorted': FileListModel.sorted_entries(index.entries.values(), sort_column, sort_order),
+        'stats': stats,
+        'created': created,
+        'convertible': [name for name in stats if name.lower().endswith(tuple(CONVERTIBLE_IMAGE_EXTENSIONS))],
+        'database_error': database_error,
+    }
+
+
+def make_buckets(resolution, step=64, max_side=None):
+    """Aspect-ratio buckets: (width, height) pairs in multiples of step with an area of at most resolution**2"""
+    max_area = resolution * resolution
+    max_side = max_side or resolution * 2
+    min_side = max(step, resolution // 4 // step * step)
+
+    buckets = set()
+    for width in range(min_side, max_side + 1, step):
+        height = min(max_side, max_area // width // step * step)
+        if height >= min_side:
+            buckets.add((width, height))
+            buckets.add((height, width))
+    return sorted(buckets)
+
+
+def assign_bucket(width, height, buckets):
+    """Pick the bucket whose aspect ratio is closest to the image's, preferring the larger bucket on ties"""
+    aspect = math.log(width / height)
+    return min(buckets, key=lambda b: (abs(math.log(b[0] / b[1]) - aspect), -b[0] * b[1]))
+
+
+# Read once at import, since os.umask can only be read by setting it
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def write_atomically(path, write):
+    """Call write(temp_path) and move the result over path, so readers never see a partial file"""
+    folder, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=folder)
+    os.close(fd)
+    try:
+        write(temp_path)
+        # mkstemp makes the file owner-only; give it the mode of the file it replaces, or a new file's mode
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o666 & ~UMASK
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_private_file(path, text):
+    """Write text to a file only its owner can read, replacing any existing file in one step"""
+    folder, name = os.path.split(path)
+    # mkstemp creates the file owner-only, so the text is never readable by anyone else, even briefly
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=folder or None)
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def convert_for_resize(img):
+    """Convert to RGB, RGBA or L, the modes reduce(), resize() and both savers handle"""
+    if img.mode in ('RGB', 'RGBA', 'L'):
+        return img
+    if img.mode.startswith('I'):
+        # 16-bit grayscale: scale into 8 bits rather than letting convert() clip everything above 255
+        return img.convert('I').point(lambda value: value / 256).convert('L')
+    if 'A' in img.getbands() or 'transparency' in img.info:
+        return img.convert('RGBA')
+    return img.convert('RGB')
+
+
+def preprocess_image(source_dir, output_dir, image_name, caption_name, buckets, mode):
+    """Resize one image into its bucket and copy its caption (runs in a worker process).
+
+    Returns (image_name, bucket, error).
+    """
+    try:
+        with Image.open(os.path.join(source_dir, image_name)) as img:
+            img = convert_for_resize(ImageOps.exif_transpose(img))
+            width, height = img.size
+            bucket = assign_bucket(width, height, buckets)
+            target_width, target_height = bucket
+
+            if mode == 'crop':
+                # Scale to cover the bucket, then take the centered region of the bucket's aspect ratio
+                scale = max(target_width / width, target_height / height)
+                box_width, box_height = min(width, target_width / scale), min(height, target_height / scale)
+                left, top = max(0, (width - box_width) / 2), max(0, (height - box_height) / 2)
+                box = (left, top, left + box_width, top + box_height)
+                if scale > 1:
+                    # Never upscale: images smaller than the bucket keep the cropped region at its own size
+                    target_width, target_height = max(1, round(box_width)), max(1, round(box_height))
+            else:
+                # Fit inside the bucket, never upscaling
+                scale = min(1, target_width / width, target_height / height)
+                target_width, target_height = max(1, round(width * scale)), max(1, round(height * scale))
+                box = (0, 0, width, height)
+
+            # A cheap integer reduce() first, so the final Lanczos pass works on a much smaller image
+            factor = int(min((box[2] - box[0]) / target_width, (box[3] - box[1]) / target_height))
+            if factor >= 2:
+                img = img.reduce(factor)
+                box = tuple(value / factor for value in box)
+
+            result = img.resize((target_width, target_height), Image.LANCZOS, box=box)
+
+            save_format = 'PNG' if image_name.lower().endswith('.png') else 'JPEG'
+            if save_format == 'JPEG' and result.mode != 'RGB':
+                result = result.convert('RGB')
+            write_atomically(os.path.join(output_dir, image_name),
+                             lambda temp_path: result.save(temp_path, save_format, **({'quality': 95} if save_format == 'JPEG' else {})))
+
+        # The caption goes last so an output image always has its caption next to it once both exist
+        caption_path = os.path.join(source_dir, caption_name)
+        if os.path.exists(caption_path):
+            write_atomically(os.path.join(output_dir, caption_name),
+                             lambda temp_path: shutil.copyfile(caption_path, temp_path))
+
+        return image_name, bucket, None
+    except Exception as e:
+        return image_name, None, str(e)
+
+
+def run_preprocess(source_dir, output_dir, resolution=1024, step=64, max_side=None, mode='crop',
+                   max_workers=None, progress=None, is_cancelled=None):
+    """Bucket and resize every image in source_dir into output_dir using a process pool.
+
+    Returns a dict with per-bucket counts ('buckets'), failures ('errors') and whether it was cancelled.
+    """
+    if os.path.abspath(source_dir) == os.path.abspath(output_dir):
+        raise ValueError("Output folder must be different from the source folder")
+    os.makedirs(output_dir, exist_ok=True)
+
+    buckets = make_buckets(resolution, step, max_side)
+    image_files = sorted((f for f in os.listdir(source_dir) if f.lower().endswith(tuple(IMAGE_EXTENSIONS))),
+                         key=natural_sort_key)
+    total = len(image_files)
+    counts = Counter()
+    errors = []
+    cancelled = False
+
+    # Spawned rather than forked workers: forking a process that runs Qt and other threads is unsafe
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        pending = {executor.submit(preprocess_image, source_dir, output_dir, image_name,
+                                   os.path.splitext(image_name)[0] + ".txt", buckets, mode)
+                   for image_name in image_files}
+        done_count = 0
+        while pending:
+            try:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            except KeyboardInterrupt:
+                # Ctrl+C in a headless run cancels like the GUI's Cancel button
+                done, cancelled = set(), True
+            for future in done:
+                image_name, bucket, error = future.result()
+                if error:
+                    errors.append((image_name, error))
+                else:
+                    counts[bucket] += 1
+                done_count += 1
+            if progress:
+                progress(done_count, total)
+            if cancelled or (is_cancelled and is_cancelled()):
+                cancelled = True
+                for future in pending:
+                    future.cancel()
+                break
+
+    return {'buckets': dict(sorted(counts.items())), 'errors': errors, 'cancelled': cancelled, 'total': total}
+
+
+def format_bucket_report(result):
+    lines = [f"{width}x{height}: {count}" for (width, height), count in result['buckets'].items()]
+    processed = sum(result['buckets'].values())
+    lines.append(f"Processed {processed} of {result['total']} images"
+                 + (" (cancelled)" if result['cancelled'] else "")
+                 + (f", {len(result['errors'])} failed" if result['errors'] else ""))
+    return "\n".join(lines)
+
+
+class LocalFileSystem:
+    """The file operations the editor makes, in one place so they can be batched and swapped out"""
+
+    def scandir_stats(self, folder_path):
+        """Stat a whole folder with one directory listing: {name: (mtime, size)}"""
+        stats = {}
+        with os.scandir(folder_path) as it:
+            for dir_entry in it:
+                try:
+                    stat = dir_entry.stat()
+                    stats[dir_entry.name] = (stat.st_mtime, stat.st_size)
+                except OSError:
+                    continue
+        return stats
+
+    def stat(self, path):
+        stat = os.stat(path)
+        return stat.st_mtime, stat.st_size
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def open(self, path):
+        return open(path, "rb")
+
+    def read_bytes(self, path):
+        with open(path, "rb") as file:
+            return file.read()
+
+    def write_bytes(self, path, data):
+        with open(path, "wb") as file:
+            file.write(data)
+
+    def rename(self, source, destination):
+        os.rename(source, destination)
+
+
+class LatencyFileSystem(LocalFileSystem):
+    """LocalFileSystem that waits before every call, to mimic a dataset on an NFS/SMB share"""
+
+    def __init__(self, latency=0.005):
+        self.latency = latency
+        self.calls = 0
+
+    def delay(self):
+        self.calls += 1
+        time.sleep(self.latency)
+
+    def scandir_stats(self, folder_path):
+        self.delay()
+        return super().scandir_stats(folder_path)
+
+    def stat(self, path):
+        self.delay()
+        return super().stat(path)
+
+    def exists(self, path):
+        self.delay()
+        return super().exists(path)
+
+    def open(self, path):
+        self.delay()
+        return super().open(path)
+
+    def read_bytes(self, path):
+        self.delay()
+        return super().read_bytes(path)
+
+    def write_bytes(self, path, data):
+        self.delay()
+        super().write_bytes(path, data)
+
+    def rename(self, source, destination):
+        self.delay()
+        super().rename(source, destination)
+
+
+def decode_caption(data):
+    return data.decode('utf-8', errors='replace')
+
+
+class FileIO:
+    """Runs file operations concurrently through a bounded thread pool, so per-call latency overlaps.
+
+    Caption text is cached against the (mtime, size) it was read at. Every read stats the file again,
+    so a caption changed outside the editor is re-read instead of served stale. Only the
+    max_cached_texts most recently used captions are kept.
+    """
+
+    def __init__(self, fs=None, max_workers=16, max_cached_texts=10000):
+        self.fs = fs or LocalFileSystem()
+        self.max_workers = max_workers
+        self.max_cached_texts = max_cached_texts
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.text_cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.prefetching = set()
+
+    def map(self, function, items):
+        """Like executor.map, but returns (result, exception) pairs so one failure does not stop the batch"""
+        def call(item):
+            try:
+                return function(item), None
+            except Exception as e:
+                return None, e
+        return list(self.executor.map(call, items))
+
+    def cached_text(self, path, text_stat):
+        with self.cache_lock:
+            cached = self.text_cache.get(path)
+            if cached and cached[0] == text_stat:
+                self.text_cache.move_to_end(path)
+                return cached[1]
+        return None
+
+    def store_text(self, path, text_stat, text):
+        with self.cache_lock:
+            self.text_cache[path] = (text_stat, text)
+            self.text_cache.move_to_end(path)
+            while len(self.text_cache) > self.max_cached_texts:
+                self.text_cache.popitem(last=False)
+
+    def invalidate(self, path):
+        with self.cache_lock:
+            self.text_cache.pop(path, None)
+
+    def clear(self):
+        with self.cache_lock:
+            self.text_cache.clear()
+
+    def read_text(self, path):
+        """Caption text at path, served from the cache while the file's (mtime, size) is unchanged"""
+        text_stat = self.fs.stat(path)
+        text = self.cached_text(path, text_stat)
+        if text is None:
+            text = decode_caption(self.fs.read_bytes(path))
+            self.store_text(path, text_stat, text)
+        return text
+
+    def read_texts(self, paths):
+        """read_text for many paths concurrently, leaving out files that could not be read: {path: text}"""
+        paths = list(paths)
+        return {path: text for path, (text, error) in zip(paths, self.map(self.read_text, paths)) if error is None}
+
+    def prefetch(self, paths):
+        """Start reading paths in the background so they are cached by the time they are needed"""
+        def fetch(path):
+            try:
+                self.read_text(path)
+            except OSError:
+                pass
+            finally:
+                self.prefetching.discard(path)
+
+        for path in paths:
+            if path not in self.prefetching:
+                self.prefetching.add(path)
+                self.executor.submit(fetch, path)
+
+    def rename_many(self, pairs):
+        """Rename (source, destination) pairs concurrently; raises the first error once all have run"""
+        for _, error in self.map(lambda pair: self.fs.rename(*pair), pairs):
+            if error:
+                raise error
+
+
+def edit_captions(folder_path, file_names, transform, file_io=None, snapshot=None, progress=None, is_cancelled=None):
+    """Rewrite each caption as transform(caption), writing only captions that actually change.
+
+    transform may also be a dict of new captions by file name. Files are read and written
+    concurrently through file_io. Captions are decoded as UTF-8 with
+    surrogateescape so bytes that are not valid UTF-8 survive the round trip. When a snapshot is
+    given, the original bytes of every file about to change are added to it first. Returns a dict
+    with the new caption, hash and stat of every written file ('updates'), failures ('errors'),
+    whether it was cancelled, and the saved snapshot id or why it could not be saved ('snapshot_error').
+    """
+    file_io = file_io or FileIO()
+    updates = {}
+    errors = []
+    total = len(file_names)
+
+    def edit(file_name):
+        file_path = os.path.join(folder_path, file_name)
+        original = file_io.fs.read_bytes(file_path)
+        content = original.decode('utf-8', errors='surrogateescape')
+        new_content = transform(content) if callable(transform) else transform[file_name]
+        if new_content == content:
+            return None
+        data = new_content.encode('utf-8', errors='surrogateescape')
+        if snapshot:
+            snapshot.add_caption(file_name, original)
+        file_io.fs.write_bytes(file_path, data)
+        return {
+            'caption': data.decode('utf-8', errors='replace'),
+            'data': data,
+            'caption_hash': hashlib.sha256(data).hexdigest(),
+            'text_stat': file_io.fs.stat(file_path),
+        }
+
+    futures = {file_io.executor.submit(edit, file_name): file_name for file_name in file_names}
+    cancelled = False
+    done_count = 0
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+        for future in done:
+            file_name = futures[future]
+            try:
+                update = future.result()
+            except Exception as e:
+                errors.append((file_name, str(e)))
+            else:
+                if update:
+                    updates[file_name] = update
+            done_count += 1
+        if progress:
+            progress(done_count, total)
+        if not cancelled and is_cancelled and is_cancelled():
+            cancelled = True
+            # Edits that already started cannot be stopped and may still write their file, so they
+            # stay pending and are collected like the rest; only the ones not started are dropped
+            pending = {future for future in pending if not future.cancel()}
+
+    # The captions are already written, so a snapshot that cannot be saved is reported, not treated as a failed edit
+    snapshot_id = snapshot_error = None
+    if snapshot:
+        try:
+            snapshot_id = snapshot.save()
+        except OSError as e:
+            snapshot_error = str(e)
+    return {'updates': updates, 'errors': errors, 'cancelled': cancelled, 'total': total,
+            'snapshot_id': snapshot_id, 'snapshot_error': snapshot_error}
+
+
+class Snapshot:
+    """Manifest of one bulk operation: the caption hashes and renames needed to roll it back"""
+
+    def __init__(self, store, operation, details):
+        self.store = store
+        self.manifest = {
+            'id': f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}",
+            'timestamp': time.time(),
+            'operation': operation,
+            'details': details,
+            'captions': {},
+            'renames': [],
+        }
+
+    def add_caption(self, file_name, data):
+        self.manifest['captions'][file_name] = self.store.put_blob(data)
+
+    def add_rename(self, old_name, new_name):
+        self.manifest['renames'].append((old_name, new_name))
+
+    def save(self):
+        """Write the manifest (if anything was recorded) and prune the store; returns the snapshot id"""
+        if not self.manifest['captions'] and not self.manifest['renames']:
+            return None
+        self.store.write_manifest(self.manifest)
+        # Pruning is housekeeping: whatever it cannot do now is left for the next save
+        try:
+            self.store.prune()
+        except Exception as e:
+            print(f"Failed to prune snapshots: {e}")
+        return self.manifest['id']
+
+
+class SnapshotStore:
+    """Content-addressed store of compressed caption blobs plus one small manifest per bulk operation.
+
+    Blobs are named by the SHA-256 of the caption, so a caption seen in several snapshots is stored once,
+    and a snapshot only costs the files the operation actually changed.
+    """
+
+    def __init__(self, folder_path, max_bytes=SNAPSHOT_MAX_BYTES, max_age_days=SNAPSHOT_MAX_AGE_DAYS):
+        self.folder_path = folder_path
+        self.root = os.path.join(folder_path, SNAPSHOT_DIR_NAME)
+        self.blob_dir = os.path.join(self.root, "blobs")
+        self.manifest_dir = os.path.join(self.root, "manifests")
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+
+    def begin(self, operation, details=None):
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        return Snapshot(self, operation, details)
+
+    def blob_path(self, blob_hash):
+        return os.path.join(self.blob_dir, blob_hash[:2], blob_hash[2:])
+
+    def put_blob(self, data):
+        blob_hash = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(blob_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            compressed = zlib.compress(data, 6)
+
+            def write(temp_path):
+                with open(temp_path, "wb") as file:
+                    file.write(compressed)
+            write_atomically(path, write)
+        return blob_hash
+
+    def get_blob(self, blob_hash):
+        with open(self.blob_path(blob_hash), "rb") as file:
+            return zlib.decompress(file.read())
+
+    def write_manifest(self, manifest):
+        def write(temp_path):
+            with open(temp_path, "w") as file:
+                json.dump(manifest, file)
+        write_atomically(os.path.join(self.manifest_dir, manifest['id'] + ".json"), write)
+
+    def list_manifests(self):
+        """All manifests, newest first"""
+        if not os.path.isdir(self.manifest_dir):
+            return []
+        manifests = []
+        for name in os.listdir(self.manifest_dir):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.manifest_dir, name), "r") as file:
+                        manifests.append(json.load(file))
+                except (OSError, ValueError) as e:
+                    print(f"Skipping unreadable snapshot manifest {name}: {e}")
+        return sorted(manifests, key=lambda manifest: manifest['timestamp'], reverse=True)
+
+    def delete_manifest(self, manifest_id):
+        path = os.path.join(self.manifest_dir, manifest_id + ".json")
+        if os.path.exists(path):
+            os.remove(path)
+
+    def prune(self):
+        """Drop manifests past the age budget, then the oldest until the blobs fit the size budget.
+
+        The newest manifest is always kept. Blobs no longer referenced by any manifest are deleted.
+        """
+        manifests = self.list_manifests()
+        cutoff = time.time() - self.max_age_days * 86400
+        keep = [manifest for index, manifest in enumerate(manifests) if index == 0 or manifest['timestamp'] >= cutoff]
+
+        blob_sizes = {}
+        if os.path.isdir(self.blob_dir):
+            for prefix in os.listdir(self.blob_dir):
+                prefix_dir = os.path.join(self.blob_dir, prefix)
+                if not os.path.isdir(prefix_dir):
+                    continue  # Not a blob directory, e.g. a .DS_Store left by Finder
+                for name in os.listdir(prefix_dir):
+                    blob_sizes[prefix + name] = os.path.getsize(os.path.join(prefix_dir, name))
+
+        def referenced(manifests):
+            return {blob_hash for manifest in manifests for blob_hash in manifest['captions'].values()}
+
+        while len(keep) > 1 and sum(blob_sizes.get(h, 0) for h in referenced(keep)) > self.max_bytes:
+            keep.pop()
+
+        kept_ids = {manifest['id'] for manifest in keep}
+        for manifest in manifests:
+            if manifest['id'] not in kept_ids:
+                self.delete_manifest(manifest['id'])
+
+        for blob_hash in set(blob_sizes) - referenced(keep):
+            try:
+                os.remove(self.blob_path(blob_hash))
+            except OSError as e:
+                print(f"Failed to remove snapshot blob {blob_hash}: {e}")
+
+    def restore(self, manifest_id, file_io=None, progress=None, is_cancelled=None):
+        """Roll back one operation: write its captions back and undo its renames.
+
+        The current state is snapshotted first, so a rollback can itself be rolled back. A file that
+        cannot reach its old name is put back where it was; one that cannot be put back either stays
+        under its temporary name, which the rollback's own snapshot records.
+        """
+        file_io = file_io or FileIO()
+        manifest = next((m for m in self.list_manifests() if m['id'] == manifest_id), None)
+        if manifest is None:
+            raise ValueError(f"Snapshot {manifest_id} not found")
+
+        snapshot = self.begin("rollback", f"{manifest['operation']} ({manifest['id']})")
+        errors = []
+        total = len(manifest['renames']) + len(manifest['captions'])
+        cancelled = False
+        done_count = 0
+        snapshot_id = snapshot_error = None
+
+        # Where each file this rollback moved is now, by its name before the rollback. It is updated
+        # as each rename succeeds, so the snapshot saved at the end undoes exactly the moves that happened
+        locations = {}
+
+        def move(item):
+            name, source, destination = item
+            file_io.fs.rename(os.path.join(self.folder_path, source), os.path.join(self.folder_path, destination))
+            locations[name] = destination
+
+        def restore_caption(item):
+            file_name, blob_hash = item
+            file_path = os.path.join(self.folder_path, file_name)
+            if file_io.fs.exists(file_path):
+                snapshot.add_caption(file_name, file_io.fs.read_bytes(file_path))
+            file_io.fs.write_bytes(file_path, self.get_blob(blob_hash))
+
+        try:
+            # Renames are undone in two steps through unique temporary names, like rename_files does
+            if manifest['renames']:
+                final_names = {new_name: old_name for old_name, new_name in manifest['renames']}
+                temp_moves = []
+                for old_name, new_name in manifest['renames']:
+                    if not file_io.fs.exists(os.path.join(self.folder_path, new_name)):
+                        errors.append((new_name, "File no longer exists"))
+                        continue
+                    temp_moves.append((new_name, new_name, f".rollback_{uuid.uuid4().hex}_{old_name}"))
+                for (name, _, _), (_, error) in zip(temp_moves, file_io.map(move, temp_moves)):
+                    if error:
+                        errors.append((name, str(error)))
+
+                # Every file that reached its temporary name is moved on to its final one, or else put back
+                final_moves = [(name, locations[name], final_names[name]) for name, _, _ in temp_moves if name in locations]
+                for (name, temp_name, _), (_, error) in zip(final_moves, file_io.map(move, final_moves)):
+                    if error:
+                        errors.append((name, str(error)))
+                        _, error = file_io.map(move, [(name, temp_name, name)])[0]
+                        if error:
+                            print(f"Failed to move {temp_name} back to {name}: {error}")
+                done_count = len(manifest['renames'])
+                if progress:
+                    progress(done_count, total)
+
+            futures = {file_io.executor.submit(restore_caption, item): item[0] for item in manifest['captions'].items()}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors.append((futures[future], str(e)))
+                    done_count += 1
+                if progress:
+                    progress(done_count, total)
+                if not cancelled and is_cancelled and is_cancelled():
+                    cancelled = True
+                    # A restore that already started has added to the snapshot and may still be writing, so
+                    # the manifest is only saved once every started restore has finished
+                    pending = {future for future in pending if not future.cancel()}
+        finally:
+            # Saved even if a step raised, so whatever was already moved or overwritten can be undone
+            for name, location in locations.items():
+                if location != name:
+                    snapshot.add_rename(name, location)
+            try:
+                snapshot_id = snapshot.save()
+            except OSError as e:
+                snapshot_error = str(e)
+
+        return {'restored': done_count - len(errors), 'errors': errors, 'cancelled': cancelled,
+                'total': total, 'snapshot_id': snapshot_id, 'snapshot_error': snapshot_error}
+
+
+def run_io_benchmark(num_files=300, latency=0.005, max_workers=16):
+    """Time the editor's file access patterns one call at a time and through FileIO, on a LatencyFileSystem.
+
+    Returns (name, sequential seconds, FileIO seconds) rows.
+    """
+    fs = LatencyFileSystem(latency)
+    file_io = FileIO(fs, max_workers)
+    sequential_io = FileIO(fs, max_workers=1)
+
+    def timed(function):
+        start = time.perf_counter()
+        function()
+        return time.perf_counter() - start
+
+    # A real (tiny) JPEG, so opening the folder reads headers like it would on a real dataset
+    image_data = io.BytesIO()
+    Image.new('RGB', (64, 48)).save(image_data, 'JPEG')
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder_path:
+        base_names = [f"image_{index:05d}" for index in range(num_files)]
+        for base_name in base_names:
+            with open(os.path.join(folder_path, base_name + ".txt"), "w") as file:
+                file.write(f"caption for {base_name}")
+            with open(os.path.join(folder_path, base_name + ".jpg"), "wb") as file:
+                file.write(image_data.getvalue())
+        text_names = [base_name + ".txt" for base_name in base_names]
+        text_paths = [os.path.join(folder_path, name) for name in text_names]
+
+        results.append(("Open folder (no cache)",
+                        timed(lambda: ImageMetadataIndex(max_workers=1, fs=fs).refresh(folder_path)),
+                        timed(lambda: ImageMetadataIndex(max_workers=max_workers, fs=fs).refresh(folder_path))))
+
+        results.append(("Find associated images",
+                        timed(lambda: [next((ext for ext in IMAGE_EXTENSIONS
+                                             if fs.exists(os.path.join(folder_path, base_name + ext))), None)
+                                       for base_name in base_names]),
+                        timed(lambda: fs.scandir_stats(folder_path))))
+
+        results.append(("Read captions for search",
+                        timed(lambda: [fs.read_bytes(path) for path in text_paths]),
+                        timed(lambda: file_io.read_texts(text_paths))))
+
+        results.append(("Bulk edit captions",
+                        timed(lambda: edit_captions(folder_path, text_names, lambda c: c + " a", sequential_io)),
+                        timed(lambda: edit_captions(folder_path, text_names, lambda c: c + " b", file_io))))
+
+        renames = [(path, path + ".renamed") for path in text_paths]
+        results.append(("Rename files",
+                        timed(lambda: [fs.rename(*pair) for pair in renames]),
+                        timed(lambda: file_io.rename_many([(new, old) for old, new in renames]))))
+
+    file_io.executor.shutdown()
+    sequential_io.executor.shutdown()
+    return results
+
+
+class LintRule:
+    """A caption quality check. check(content, data, context) flags a caption; fix(content, context) repairs it"""
+
+    def __init__(self, code, description, check, fix=None):
+        self.code = code
+        self.description = description
+        self.check = check
+        self.fix = fix
+
+
+# Rules by code. Register new ones with @lint_rule at import time so worker processes see them too
+LINT_RULES = {}
+
+LINT_MAX_WORDS = 75
+
+
+def lint_rule(code, description, fix=None):
+    def register(check):
+        LINT_RULES[code] = LintRule(code, description, check, fix)
+        return check
+    return register
+
+
+def fix_duplicate_tags(content, context):
+    seen = set()
+    tags = []
+    for tag in content.split(','):
+        key = tag.strip().lower()
+        if key and key in seen:
+            continue
+        seen.add(key)
+        tags.append(tag)
+    return ','.join(tags)
+
+
+def fix_non_utf8(content, context):
+    # Captions that are not UTF-8 are almost always Windows-1252, so re-read them as that
+    data = content.encode('utf-8', errors='surrogateescape')
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('cp1252', errors='replace')
+
+
+@lint_rule('empty', "Caption is empty")
+def check_empty(content, data, context):
+    return not content.strip()
+
+
+@lint_rule('duplicate_tags', "The same tag appears more than once", fix_duplicate_tags)
+def check_duplicate_tags(content, data, context):
+    tags = [tag.strip().lower() for tag in content.split(',') if tag.strip()]
+    return len(tags) != len(set(tags))
+
+
+@lint_rule('whitespace', "Leading or trailing whitespace", lambda content, context: content.strip())
+def check_whitespace(content, data, context):
+    return content != content.strip()
+
+
+@lint_rule('double_comma', "Double comma", lambda content, context: re.sub(r',(\s*,)+', ',', content))
+def check_double_comma(content, data, context):
+    return re.search(r',\s*,', content) is not None
+
+
+@lint_rule('non_utf8', "Caption is not valid UTF-8", fix_non_utf8)
+def check_non_utf8(content, data, context):
+    try:
+        data.decode('utf-8')
+        return False
+    except UnicodeDecodeError:
+        return True
+
+
+@lint_rule('missing_trigger', "Trigger word is missing", lambda content, context: f"{context['trigger']} {content}")
+def check_missing_trigger(content, data, context):
+    # The trigger has to appear as a whole word: 'ohwx' is not in 'ohwxman, cat'. Lookarounds rather
+    # than \b, so triggers starting or ending in punctuation such as '<lora:x>' match too
+    trigger = context.get('trigger')
+    return bool(trigger) and not re.search(rf'(?<!\w){re.escape(trigger)}(?!\w)', content, re.IGNORECASE)
+
+
+@lint_rule('too_long', "Caption is longer than the word limit")
+def check_too_long(content, data, context):
+    return len(content.split()) > context.get('max_words', LINT_MAX_WORDS)
+
+
+def lint_caption(data, codes, context):
+    """Codes of the rules that flag this caption's bytes"""
+    content = data.decode('utf-8', errors='replace')
+    return tuple(code for code in codes if LINT_RULES[code].check(content, data, context))
+
+
+def lint_files(folder_path, file_names, codes, context):
+    """Lint a chunk of files (runs in a worker process); returns (name, hash, codes) per readable file"""
+    results = []
+    for file_name in file_names:
+        try:
+            with open(os.path.join(folder_path, file_name), "rb") as file:
+                data = file.read()
+        except OSError:
+            continue
+        results.append((file_name, hashlib.sha256(data).hexdigest(), lint_caption(data, codes, context)))
+    return results
+
+
+def run_lint(folder_path, files, cache, codes, context, fs=None, chunk_size=200, max_workers=None,
+             progress=None, is_cancelled=None):
+    """Lint files, given as {name: (text stat, caption hash)} from the index, in worker processes.
+
+    A file is not read again when its hash is already in cache and a fresh stat of the folder shows
+    it unchanged since it was indexed; captions edited outside the editor are always linted.
+    Returns the findings per file ('findings') and the new hash results to merge into the cache ('cache').
+    """
+    stats = (fs or LocalFileSystem()).scandir_stats(folder_path)
+    findings = {}
+    new_results = {}
+    to_lint = []
+    for file_name, (text_stat, caption_hash) in files.items():
+        if caption_hash is not None and caption_hash in cache and stats.get(file_name) == text_stat:
+            findings[file_name] = cache[caption_hash]
+        else:
+            to_lint.append(file_name)
+
+    total = len(files)
+    done_count = len(findings)
+    cancelled = False
+    if progress:
+        progress(done_count, total)
+
+    if to_lint:
+        chunks = [to_lint[i:i + chunk_size] for i in range(0, len(to_lint), chunk_size)]
+        # Spawned like run_preprocess's workers, since this runs inside the Qt process
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {executor.submit(lint_files, folder_path, chunk, codes, context): len(chunk) for chunk in chunks}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for file_name, caption_hash, found in future.result():
+                        findings[file_name] = found
+                        new_results[caption_hash] = found
+                    done_count += futures[future]
+                if progress:
+                    progress(done_count, total)
+                if is_cancelled and is_cancelled():
+                    cancelled = True
+                    for future in pending:
+                        future.cancel()
+                    break
+
+    return {'findings': findings, 'cache': new_results, 'cancelled': cancelled, 'total': total}
+
+
+class BackgroundJob(QThread):
+    """Runs function(**kwargs, progress=..., is_cancelled=...) off the UI thread"""
+
+    progress = pyqtSignal(int, int)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, function, **kwargs):
+        super().__init__()
+        self.function = function
+        self.kwargs = kwargs
+        self.cancel_requested = False
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def run(self):
+        try:
+            result = self.function(**self.kwargs, progress=self.progress.emit,
+                                   is_cancelled=lambda: self.cancel_requested)
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
+
+
+class AutomationServer(QObject):
+    """Local-only JSON API for scripts, served by asyncio on its own thread so the Qt loop never blocks.
+
+    Each line a client sends is a request {"id", "method", "params", "token"}, or a list of them, and is
+    answered with a line {"id", "result"} or {"id", "error"}. The token is generated per server and written
+    to token_path with owner-only permissions, so only the user running the editor can read it. Events such
+    as {"event": "captions_changed"} are pushed to every client that has made an authorized request.
+    Handlers run on the Qt thread; one may return a Future to answer later.
+    """
+
+    call_requested = pyqtSignal(object)
+
+    # Requests are single lines; asyncio's 64 KiB default is far too small for a batch of captions
+    MAX_LINE_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, handlers, host='127.0.0.1', port=0, socket_path=None, token_path=None):
+        super().__init__()
+        self.handlers = handlers
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.token = secrets.token_urlsafe(32)
+        self.token_path = token_path
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.error = None
+        self.writers = set()
+        self.ready = threading.Event()
+        # Emitted from the server thread, so Qt queues the call onto the thread this object lives in
+        self.call_requested.connect(self.run_handler)
+
+    @property
+    def address(self):
+        return self.socket_path or f"{self.host}:{self.port}"
+
+    def start(self):
+        if self.token_path:
+            write_private_file(self.token_path, self.token)
+        self.thread = threading.Thread(target=self.serve, name="automation-api", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error:
+            raise self.error
+
+    def serve(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            if self.socket_path:
+                self.server = self.loop.run_until_complete(
+                    asyncio.start_unix_server(self.handle_client, path=self.socket_path, limit=self.MAX_LINE_BYTES))
+                os.chmod(self.socket_path, 0o600)
+            else:
+                self.server = self.loop.run_until_complete(
+                    asyncio.start_server(self.handle_client, self.host, self.port, limit=self.MAX_LINE_BYTES))
+                self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self.error = e
+            self.ready.set()
+            return
+        self.ready.set()
+        self.loop.run_forever()
+
+        # stop() cancelled the client handlers; let them close their connections before the loop goes
+        tasks = asyncio.all_tasks(self.loop)
+        if tasks:
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
+
+    def stop(self):
+        """Close the server and every client connection, and wait for the server thread to exit"""
+        if self.loop and self.server:
+            def shutdown():
+                self.server.close()
+                for task in asyncio.all_tasks(self.loop):
+                    task.cancel()
+                self.loop.stop()
+            self.loop.call_soon_threadsafe(shutdown)
+            self.thread.join(timeout=5)
+            self.server = None
+        if self.token_path:
+            # Another editor may have started since and written its own token
+            try:
+                with open(self.token_path) as file:
+                    if file.read() == self.token:
+                        os.remove(self.token_path)
+            except OSError:
+                pass
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # The rest of an oversized line can't be told apart from the next request,
+                    # so the client gets an error and the connection is closed
+                    writer.write(json.dumps({'id': None, 'error': f"Request line is longer than "
+                                             f"{self.MAX_LINE_BYTES} bytes"}).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError as e:
+                    response = {'id': None, 'error': f"Invalid JSON: {e}"}
+                else:
+                    # A list is a batch: its requests run in order and are answered with one list
+                    if isinstance(message, list):
+                        response = [await self.dispatch(request, writer) for request in message]
+                    else:
+                        response = await self.dispatch(message, writer)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    async def dispatch(self, request, writer):
+        request_id = request.get('id') if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict):
+                raise ValueError(f"Invalid request: {request}")
+            if not hmac.compare_digest(str(request.get('token', '')).encode(), self.token.encode()):
+                raise PermissionError("Missing or wrong API token")
+            # Events only go to clients that have shown the token
+            self.writers.add(writer)
+            if request.get('method') not in self.handlers:
+                raise ValueError(f"Unknown method: {request.get('method')}")
+            future = Future()
+            self.call_requested.emit((request['method'], request.get('params') or {}, future))
+            return {'id': request_id, 'result': await asyncio.wrap_future(future)}
+        except Exception as e:
+            return {'id': request_id, 'error': str(e)}
+
+    def run_handler(self, call):
+        method, params, future = call
+        try:
+            result = self.handlers[method](**params)
+        except Exception as e:
+            future.set_exception(e)
+            return
+
+        if isinstance(result, Future):
+            def forward(done):
+                if done.exception():
+                    future.set_exception(done.exception())
+                else:
+                    future.set_result(done.result())
+            result.add_done_callback(forward)
+        else:
+            future.set_result(result)
+
+    def publish(self, event):
+        """Push an event to every connected client (call from the Qt thread)"""
+        if self.loop and self.writers:
+            self.loop.call_soon_threadsafe(self.broadcast, json.dumps(event).encode() + b"\n")
+
+    def broadcast(self, data):
+        for writer in list(self.writers):
+            writer.write(data)
+
+
+class AutomationClient:
+    """Minimal blocking client for the automation API; events that arrive between replies collect in events.
+
+    The token is read from token_path unless it is given.
+    """
+
+    def __init__(self, port=None, host='127.0.0.1', socket_path=None, timeout=60, token=None, token_path=API_TOKEN_PATH):
+        if token is None:
+            with open(token_path) as file:
+                token = file.read().strip()
+        self.token = token
+        if socket_path:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(timeout)
+            self.socket.connect(socket_path)
+        else:
+            self.socket = socket.create_connection((host, port), timeout=timeout)
+        self.file = self.socket.makefile('rwb')
+        self.next_id = 0
+        self.events = []
+
+    def send(self, message):
+        self.file.write(json.dumps(message).encode() + b"\n")
+        self.file.flush()
+
+    def receive(self):
+        """Next reply, storing any events that come before it"""
+        while True:
+            line = self.file.readline()
+            if not line:
+                raise ConnectionError("Connection closed by the editor")
+            message = json.loads(line)
+            if isinstance(message, dict) and 'event' in message:
+                self.events.append(message)
+                continue
+            return message
+
+    def call(self, method, **params):
+        self.next_id += 1
+        self.send({'id': self.next_id, 'method': method, 'params': params, 'token': self.token})
+        response = self.receive()
+        if response.get('error') is not None:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def batch(self, calls):
+        """Send [(method, params), ...] as one request; returns the raw responses in order"""
+        requests = []
+        for method, params in calls:
+            self.next_id += 1
+            requests.append({'id': self.next_id, 'method': method, 'params': params, 'token': self.token})
+        self.send(requests)
+        return self.receive()
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+class FileListModel(QAbstractTableModel):
+    """Rows of the file list, one per metadata entry.
+
+    Qt only asks for the cells in view, so no text is built for rows that are never shown. Rows are
+    entries in memory, or, while a folder with a project database is being indexed, (id, name) pairs
+    from the database whose entries are fetched a page at a time as they are shown.
+    """
+
+    PAGE_SIZE = 256
+
+    def __init__(self):
+        super().__init__()
+        self.entries = []
+        self.database = None
+        self.database_rows = []
+        self.pages = {}
+        self.row_numbers = None  # name -> row, built when first needed
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.database_rows) if self.database else len(self.entries)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(ImageMetadataIndex.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return ImageMetadataIndex.COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return self.column_texts(self.entry(index.row()))[index.column()]
+
+    def entry(self, row):
+        if not self.database:
+            return self.entries[row]
+        page = row // self.PAGE_SIZE
+        if page not in self.pages:
+            rows = self.database_rows[page * self.PAGE_SIZE:(page + 1) * self.PAGE_SIZE]
+            by_id = self.database.entries_by_id([row_id for row_id, _ in rows])
+            # A file dropped from the database since the rows were listed still shows its name
+            self.pages[page] = [by_id.get(row_id) or {'name': name} for row_id, name in rows]
+        return self.pages[page][row % self.PAGE_SIZE]
+
+    def name(self, row):
+        return self.database_rows[row][1] if self.database else self.entries[row]['name']
+
+    def show_entries(self, entries):
+        """Show a list of entries, already sorted and filtered"""
+        self.beginResetModel()
+        self.entries = entries
+        self.database = None
+        self.database_rows = []
+        self.pages = {}
+        self.row_numbers = None
+        self.endResetModel()
+
+    def show_database(self, database, column, order):
+        """Show every file stored in database, sorted on column by SQLite"""
+        self.beginResetModel()
+        self.entries = []
+        self.database = database
+        self.database_rows = database.sorted_rows(ImageMetadataIndex.COLUMNS[column][1],
+                                                  order == Qt.DescendingOrder)
+        self.pages = {}
+        self.row_numbers = None
+        self.endResetModel()
+
+    def row_of(self, name):
+        if self.row_numbers is None:
+            self.row_numbers = {self.name(row): row for row in range(self.rowCount())}
+        return self.row_numbers.get(name)
+
+    def refresh_names(self, names):
+        """Redraw the rows of entries that changed in place"""
+        last_column = self.columnCount() - 1
+        for name in names:
+            row = self.row_of(name)
+            if row is not None:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+
+    @staticmethod
+    def column_texts(entry):
+        return [
+            entry['name'],
+            str(entry['width']) if entry.get('width') is not None else "",
+            str(entry['height']) if entry.get('height') is not None else "",
+            f"{entry['aspect']:.2f}" if entry.get('aspect') is not None else "",
+            f"{entry['megapixels']:.2f}" if entry.get('megapixels') is not None else "",
+            entry.get('format') or "",
+            format_file_size(entry['file_size']) if entry.get('file_size') is not None else "",
+            str(entry['caption_length']) if entry.get('caption_length') is not None else "",
+            ", ".join(entry['lint']) if entry.get('lint') else "",
+        ]
+
+    @staticmethod
+    def sorted_entries(entries, column, order):
+        """Sort entries in Python on the precomputed key for column; rows without a value come first"""
+        key = ImageMetadataIndex.COLUMNS[column][1]
+        reverse = order == Qt.DescendingOrder
+        if key == 'sort_key':
+            # Every entry has a name key, so the common case skips building a tuple per row
+            return sorted(entries, key=lambda entry: entry['sort_key'], reverse=reverse)
+        return sorted(entries, key=lambda entry: (entry.get(key) is not None, entry.get(key)), reverse=reverse)
+
 
 class FileEditorApp(QMainWindow):
-    def __init__(self, dark_mode=False):
+    def __init__(self, dark_mode=False, snapshot_max_bytes=SNAPSHOT_MAX_BYTES, snapshot_max_age_days=SNAPSHOT_MAX_AGE_DAYS):
         super().__init__()
         self.setWindowTitle("Simple Caption Editor")
         self.setGeometry(100, 100, 1200, 800)
@@ -32,7 +1766,7 @@ class FileEditorApp(QMainWindow):
 
         # Control panel and file list (Column 1)
         control_panel_widget = QWidget()
-        control_panel_widget.setFixedWidth(350)
+        control_panel_widget.setFixedWidth(450)
         self.control_panel_layout = QVBoxLayout()
         
         # Create a container widget for the folder controls
@@ -126,9 +1860,50 @@ class FileEditorApp(QMainWindow):
         self.filter_entry.textChanged.connect(self.filter_file_list)
         self.control_panel_layout.addWidget(self.filter_entry)
 
-        # File list
-        self.file_list = QListWidget()
-        self.file_list.itemSelectionChanged.connect(self.on_file_select)
+        # Metadata filter input
+        self.metadata_filter_entry = QLineEdit()
+        self.metadata_filter_entry.setPlaceholderText("Filter Metadata (e.g. width<512 format=png)")
+        self.metadata_filter_entry.textChanged.connect(self.filter_file_list)
+        self.control_panel_layout.addWidget(self.metadata_filter_entry)
+
+        # File list with sortable metadata columns
+        self.file_io = FileIO()
+        self.metadata_index = ImageMetadataIndex(fs=self.file_io.fs)
+        self.project_db = None
+        self.background_job = None
+        self.snapshot_max_bytes = snapshot_max_bytes
+        self.snapshot_max_age_days = snapshot_max_age_days
+        self.lint_cache = {}  # caption hash -> rule codes, valid for lint_context
+        self.lint_context = None  # None until the first lint run
+        self.automation_server = None
+        # Caption reads for API calls, kept off the Qt thread; FileIO's own pool does the reading
+        self.api_reader = ThreadPoolExecutor(max_workers=1)
+        self.file_model = FileListModel()
+        # A table view with fixed row heights lays out any number of rows without asking the model about each
+        self.file_list = QTableView()
+        self.file_list.setModel(self.file_model)
+        self.file_list.setShowGrid(False)
+        self.file_list.setWordWrap(False)
+        self.file_list.setTabKeyNavigation(False)
+        self.file_list.verticalHeader().hide()
+        self.file_list.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.file_list.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        # Column widths are measured on a hundred rows rather than the default thousand
+        self.file_list.horizontalHeader().setResizeContentsPrecision(100)
+        self.file_list.horizontalHeader().setStretchLastSection(False)
+        # Qt's own sorting would call back into Python for every comparison, so header clicks
+        # re-sort the entries in Python (or in SQLite) instead
+        self.sort_column, self.sort_order = 0, Qt.AscendingOrder
+        self.file_list.setSortingEnabled(False)
+        self.file_list.horizontalHeader().setSectionsClickable(True)
+        self.file_list.horizontalHeader().setSortIndicatorShown(True)
+        self.file_list.horizontalHeader().setSortIndicator(self.sort_column, self.sort_order)
+        self.file_list.horizontalHeader().sortIndicatorChanged.connect(self.sort_file_list)
+        self.file_list.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.file_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.file_list.selectionModel().selectionChanged.connect(lambda *_: self.on_file_select())
+        self.file_list.verticalScrollBar().valueChanged.connect(self.prefetch_visible_captions)
+        self.list_entries = []  # index entries in display order, before filtering
         self.control_panel_layout.addWidget(self.file_list, stretch=1)
         
         # Set the layout for the control panel widget
@@ -180,6 +1955,7 @@ class FileEditorApp(QMainWindow):
         file_list_font = self.file_list.font()
         file_list_font.setPointSize(13)
         self.file_list.setFont(file_list_font)
+        self.fit_file_list_rows()
 
         # Set font size for text fields
         text_field_font = self.rename_entry.font()
@@ -189,6 +1965,7 @@ class FileEditorApp(QMainWindow):
         self.find_entry.setFont(text_field_font)
         self.replace_entry.setFont(text_field_font)
         self.filter_entry.setFont(text_field_font)
+        self.metadata_filter_entry.setFont(text_field_font)
 
         # Keyboard shortcuts
         self.setup_shortcuts()
@@ -222,6 +1999,10 @@ class FileEditorApp(QMainWindow):
         switch_focus = QShortcut(QKeySequence("Ctrl+E"), self)
         switch_focus.activated.connect(self.toggle_focus)
 
+        # Select every file left visible by the filters
+        select_visible = QShortcut(QKeySequence("Ctrl+Shift+A"), self)
+        select_visible.activated.connect(self.select_all_visible)
+
     def toggle_focus(self):
         if self.editor.hasFocus():
             self.file_list.setFocus()
@@ -234,11 +2015,25 @@ class FileEditorApp(QMainWindow):
 
     def select_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Select Folder")
+        self.open_folder(folder_path)
+
+    def open_folder(self, folder_path, interactive=True, on_finished=None, on_failed=None):
+        """Open a folder; the list fills in the background, see populate_file_list. Returns False if a job is running."""
         if folder_path:
+            if self.background_job:
+                self.statusBar.showMessage("Another operation is still running.", 3000)
+                return False
             self.folder_label.setText(folder_path)
-            self.create_missing_text_files(folder_path)
-            self.check_and_offer_image_conversion(folder_path)
-            self.populate_file_list(folder_path)
+            self.open_project_database(folder_path)
+
+            def finish(result):
+                # The job's listing shows whether any images need converting
+                if interactive:
+                    self.check_and_offer_image_conversion(folder_path, result['convertible'])
+                if on_finished:
+                    on_finished(result)
+
+            self.populate_file_list(folder_path, finish, on_failed)
 
             # Show refresh button when a folder is selected
             self.refresh_button.show()
@@ -250,6 +2045,8 @@ class FileEditorApp(QMainWindow):
             self.replace_all_button.setEnabled(True)
             self.replace_selected_button.setEnabled(True)
             self.save_button.setEnabled(True)
+            self.project_db_action.setEnabled(True)
+            return True
         else:
             # Hide refresh button if no folder is selected
             self.refresh_button.hide()
@@ -261,23 +2058,70 @@ class FileEditorApp(QMainWindow):
             self.replace_all_button.setEnabled(False)
             self.replace_selected_button.setEnabled(False)
             self.save_button.setEnabled(False)
+            self.project_db_action.setEnabled(False)
+            return False
+
+    def open_project_database(self, folder_path):
+        """Attach the folder's sidecar database if it has one; the list and index start out empty"""
+        if self.project_db:
+            self.project_db.close()
+            self.project_db = None
+        self.metadata_index.clear()
+        self.file_io.clear()
+        self.list_entries = []
+        self.file_model.show_entries([])
+
+        if ProjectDatabase.exists(folder_path):
+            try:
+                self.project_db = ProjectDatabase(folder_path)
+            except sqlite3.Error as e:
+                self.project_db = None
+                self.statusBar.showMessage(f"Failed to open project database: {e}", 3000)
 
-    def create_missing_text_files(self, folder_path):
-        image_files = [f for f in os.listdir(folder_path) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-        text_files = [f for f in os.listdir(folder_path) if f.lower().endswith('.txt')]
+        self.project_db_action.setChecked(self.project_db is not None)
 
-        for image_file in image_files:
-            base_name, _ = os.path.splitext(image_file)
-            corresponding_text_file = f"{base_name}.txt"
-            if corresponding_text_file not in text_files:
-                text_file_path = os.path.join(folder_path, corresponding_text_file)
-                with open(text_file_path, 'w') as file:
-                    file.write("")  # Create an empty text file
-                self.statusBar.showMessage(f"Created missing text file: {corresponding_text_file}", 3000)
+    def toggle_project_database(self, enabled):
+        folder_path = self.folder_label.text()
+        if not os.path.isdir(folder_path):
+            self.project_db_action.setChecked(False)
+            return
+        if self.background_job:
+            self.project_db_action.setChecked(self.project_db is not None)
+            self.statusBar.showMessage("Another operation is still running.", 3000)
+            return
 
-    def check_and_offer_image_conversion(self, folder_path):
-        unsupported_formats = ['.bmp', '.webp']
-        found_formats = {ext for ext in unsupported_formats if any(f.lower().endswith(ext) for f in os.listdir(folder_path))}
+        if enabled and not self.project_db:
+            try:
+                self.project_db = ProjectDatabase(folder_path)
+            except sqlite3.Error as e:
+                self.project_db_action.setChecked(False)
+                QMessageBox.critical(self, "Error", f"Failed to create project database: {e}")
+                return
+            # Every caption is read into the new database, while the list keeps its rows
+            self.populate_file_list(folder_path, reindex=True)
+            self.statusBar.showMessage(f"Created project database {PROJECT_DB_NAME}.", 3000)
+        elif not enabled and self.project_db:
+            reply = QMessageBox.question(self, 'Remove Project Database',
+                                         f"Delete {PROJECT_DB_NAME} from this folder? Captions are not affected.",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply == QMessageBox.No:
+                self.project_db_action.setChecked(True)
+                return
+            db_path = self.project_db.path
+            self.project_db.close()
+            self.project_db = None
+            for suffix in ['', '-wal', '-shm']:
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+            self.statusBar.showMessage("Project database removed.", 3000)
+
+    def check_and_offer_image_conversion(self, folder_path, file_names=None):
+        """Offer to convert unsupported images among file_names (default: the folder); returns True if any were converted"""
+        unsupported_formats = CONVERTIBLE_IMAGE_EXTENSIONS
+        if file_names is None:
+            file_names = os.listdir(folder_path)
+        file_names = [f.lower() for f in file_names]
+        found_formats = {ext for ext in unsupported_formats if any(f.endswith(ext) for f in file_names)}
 
         if found_formats:
             found_formats_str = ', '.join(found_formats)
@@ -288,7 +2132,8 @@ class FileEditorApp(QMainWindow):
             
             reply = QMessageBox.question(self, 'Convert Images', message, QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if reply == QMessageBox.Yes:
-                self.convert_images(folder_path, [f for f in os.listdir(folder_path) if any(f.lower().endswith(ext) for ext in found_formats)])
+                return self.convert_images(folder_path, [f for f in os.listdir(folder_path) if any(f.lower().endswith(ext) for ext in found_formats)])
+        return False
 
     def convert_images(self, folder_path, image_files):
         format_choice, ok = QInputDialog.getItem(self, "Select Format", "Convert images to:", [".jpeg", ".png"], 0, False)
@@ -318,32 +2163,507 @@ class FileEditorApp(QMainWindow):
                     QMessageBox.critical(self, "Error", f"Failed to convert {image_file}: {e}")
                     print(f"Failed to convert {image_file}: {e}")  # Print detailed error
 
-            # Only update the file list if there were successful conversions
+            # Only update the file list if there were successful conversions; the new images get captions there
             if successful_conversions:
                 self.populate_file_list(folder_path)
-                self.create_missing_text_files(folder_path)  # Ensure text files are created for new images
+            return bool(successful_conversions)
+        return False
+
+    def run_background_job(self, title, function, on_success, on_failure=None, modal=True, **kwargs):
+        """Run function in a BackgroundJob behind a cancellable progress dialog.
+
+        A job that is not modal leaves the window usable and shows its progress in the status bar.
+        Failures go to on_failure with the error message; without one they are shown in a dialog.
+        """
+        dialog = None
+        if modal:
+            dialog = QProgressDialog(title, "Cancel", 0, 0, self)
+            dialog.setWindowTitle(title)
+            dialog.setWindowModality(Qt.WindowModal)
+            dialog.setMinimumDuration(0)
+        else:
+            self.statusBar.showMessage(f"{title}...")
+
+        job = BackgroundJob(function, **kwargs)
+        self.background_job = job  # Keep a reference until the thread finishes
+
+        def update_progress(done, total):
+            if dialog:
+                dialog.setMaximum(total)
+                dialog.setValue(done)
+                dialog.setLabelText(f"{title} ({done}/{total})")
+            else:
+                self.statusBar.showMessage(f"{title} ({done}/{total})")
+
+        def finish(callback, value):
+            if dialog:
+                dialog.reset()
+            else:
+                self.statusBar.clearMessage()
+            self.background_job = None
+            callback(value)
+
+        job.progress.connect(update_progress)
+        job.succeeded.connect(lambda result: finish(on_success, result))
+        job.failed.connect(lambda error: finish(
+            on_failure or (lambda e: QMessageBox.critical(self, "Error", f"{title} failed: {e}")), error))
+        if dialog:
+            dialog.canceled.connect(job.cancel)
+        job.start()
+        return job
+
+    def snapshot_store(self, folder_path):
+        return SnapshotStore(folder_path, self.snapshot_max_bytes, self.snapshot_max_age_days)
+
+    def rollback_operation(self):
+        folder_path = self.folder_label.text()
+        if not os.path.isdir(folder_path):
+            self.statusBar.showMessage("Please select a valid folder.", 3000)
+            return
+        if self.background_job:
+            self.statusBar.showMessage("Another operation is still running.", 3000)
+            return
+
+        store = self.snapshot_store(folder_path)
+        manifests = store.list_manifests()
+        if not manifests:
+            self.statusBar.showMessage("No bulk operations to roll back.", 3000)
+            return
+
+        labels = []
+        for manifest in manifests:
+            count = len(manifest['captions']) + len(manifest['renames'])
+            label = f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(manifest['timestamp']))}  {manifest['operation']}"
+            if manifest['details']:
+                label += f" '{manifest['details']}'"
+            labels.append(f"{label} ({count} files)")
+
+        choice, ok = QInputDialog.getItem(self, "Roll Back", "Restore the files changed by:", labels, 0, False)
+        if not ok:
+            return
+        manifest = manifests[labels.index(choice)]
+
+        if manifest is not manifests[0]:
+            reply = QMessageBox.question(self, 'Roll Back',
+                                         "Newer operations have changed files since this one. Rolling it back "
+                                         "out of order restores its files as they were, even if they were renamed "
+                                         "or edited later. Continue?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply == QMessageBox.No:
+                return
+
+        def finish_rollback(result):
+            for file_name, error in result['errors']:
+                print(f"Failed to restore {file_name}: {error}")
+            message = f"Restored {result['restored']} of {result['total']} files."
+            if result['cancelled']:
+                message += " (cancelled)"
+            if result['errors']:
+                message += f" {len(result['errors'])} files failed."
+            if result['snapshot_error']:
+                message += f" The rollback snapshot could not be saved: {result['snapshot_error']}"
+            self.statusBar.showMessage(message, 5000)
+            self.file_io.clear()
+            self.populate_file_list(folder_path)
+
+        self.unsaved_changes = False  # Temporarily disable unsaved changes check
+        self.run_background_job("Rolling back", store.restore, finish_rollback,
+                                manifest_id=manifest['id'], file_io=self.file_io)
+
+    def current_lint_context(self):
+        return {'trigger': self.trigger_entry.text().strip(), 'max_words': LINT_MAX_WORDS}
+
+    def apply_lint_cache(self):
+        """Fill in findings for re-read files whose caption content has already been linted"""
+        for entry in self.metadata_index.entries.values():
+            if entry.get('caption_hash') in self.lint_cache:
+                entry['lint'] = self.lint_cache[entry['caption_hash']]
+            else:
+                entry.pop('lint', None)
+
+    def lint_captions(self):
+        folder_path = self.folder_label.text()
+        if not os.path.isdir(folder_path):
+            self.statusBar.showMessage("Please select a valid folder.", 3000)
+            return
+        if self.background_job:
+            self.statusBar.showMessage("Another operation is still running.", 3000)
+            return
+
+        # Findings depend on the trigger word and rule set, so a different context starts a fresh cache
+        context = self.current_lint_context()
+        if context != self.lint_context:
+            self.lint_cache = {}
+
+        files = {name: (entry['stamp'][0], entry.get('caption_hash')) for name, entry in self.metadata_index.entries.items()}
+
+        def show_findings(result):
+            self.lint_context = context
+            self.lint_cache.update(result['cache'])
+            for file_name, found in result['findings'].items():
+                entry = self.metadata_index.entries.get(file_name)
+                if entry:
+                    entry['lint'] = found
+            self.filter_file_list()
+
+            flagged = sum(1 for found in result['findings'].values() if found)
+            message = f"Lint found issues in {flagged} of {result['total']} files. Filter with lint=any."
+            if result['cancelled']:
+                message += " (cancelled)"
+            self.statusBar.showMessage(message, 5000)
+
+        self.run_background_job("Linting captions", run_lint, show_findings,
+                                folder_path=folder_path, files=files, cache=dict(self.lint_cache),
+                                codes=list(LINT_RULES), context=context, fs=self.file_io.fs)
+
+    def fix_lint_findings(self):
+        if self.lint_context is None:
+            self.statusBar.showMessage("Run Lint Captions first.", 3000)
+            return
+
+        choices = []
+        for code, rule in LINT_RULES.items():
+            file_names = [name for name, entry in self.metadata_index.entries.items() if code in (entry.get('lint') or ())]
+            if rule.fix and file_names:
+                choices.append((f"{rule.description} ({code}): {len(file_names)} files", code, file_names))
+        if not choices:
+            self.statusBar.showMessage("No fixable lint findings.", 3000)
+            return
+
+        choice, ok = QInputDialog.getItem(self, "Fix Lint Findings", "Fix every file flagged with:",
+                                          [label for label, _, _ in choices], 0, False)
+        if not ok:
+            return
+        _, code, file_names = next(c for c in choices if c[0] == choice)
+        fix = LINT_RULES[code].fix
+        context = self.lint_context
+
+        self.edit_captions_in_background(file_names, "lint_fix", code,
+                                         lambda content: fix(content, context),
+                                         f"Fixed {code} in {{count}} of {{total}} files.")
+
+    def start_automation_server(self, port=0, socket_path=None, token_path=API_TOKEN_PATH):
+        """Serve the automation API on 127.0.0.1:port (0 picks a free port) or a Unix socket.
+
+        Clients authenticate with the token written to token_path.
+        """
+        handlers = {
+            'open_folder': self.api_open_folder,
+            'refresh': self.api_refresh,
+            'query': self.api_query,
+            'read_captions': self.api_read_captions,
+            'write_captions': self.api_write_captions,
+            'apply_trigger': self.api_apply_trigger,
+            'replace': self.api_replace,
+            'stats': self.api_stats,
+        }
+        self.automation_server = AutomationServer(handlers, port=port, socket_path=socket_path, token_path=token_path)
+        self.automation_server.start()
+        self.statusBar.showMessage(f"Automation API listening on {self.automation_server.address}", 5000)
+        return self.automation_server.address
+
+    def publish_event(self, event):
+        if self.automation_server:
+            self.automation_server.publish(event)
+
+    def api_folder(self):
+        folder_path = self.folder_label.text()
+        if not os.path.isdir(folder_path):
+            raise ValueError("No folder is open")
+        return folder_path
+
+    def api_file_names(self, files):
+        """Validate requested names against the listed captions; None means every listed caption"""
+        if files is None:
+            return list(self.metadata_index.entries)
+        unknown = [name for name in files if name not in self.metadata_index.entries]
+        if unknown:
+            raise ValueError(f"Unknown files: {', '.join(unknown[:10])}")
+        return list(files)
+
+    def api_edit(self, file_names, operation, details, transform, done_message):
+        """Start a bulk edit for the API; the returned Future resolves with a summary when it finishes"""
+        if not file_names:
+            raise ValueError("No files given")
+        if self.unsaved_changes and self.current_file and os.path.basename(self.current_file) in file_names:
+            raise RuntimeError("The caption open in the editor has unsaved changes")
+        future = Future()
+
+        def finished(result):
+            future.set_result({'changed': sorted(result['updates']), 'total': result['total'],
+                               'errors': result['errors'], 'cancelled': result['cancelled'],
+                               'snapshot_id': result['snapshot_id'], 'snapshot_error': result['snapshot_error']})
+
+        def failed(error):
+            # The caller gets the error instead of a dialog popping up in front of the user
+            self.statusBar.showMessage(f"Automation API edit failed: {error}", 5000)
+            future.set_exception(RuntimeError(error))
+
+        if not self.edit_captions_in_background(file_names, operation, details, transform, done_message,
+                                                finished, failed):
+            raise RuntimeError("Another operation is still running")
+        return future
+
+    def api_check_unsaved(self):
+        """Reloading the list would ask about unsaved changes in a dialog, so API calls refuse instead"""
+        if self.unsaved_changes:
+            raise RuntimeError("The caption open in the editor has unsaved changes")
+
+    def api_list_callbacks(self):
+        """A Future with the callbacks that resolve it once the file list has been filled"""
+        future = Future()
+
+        def failed(error):
+            self.statusBar.showMessage(f"Automation API failed to read the folder: {error}", 5000)
+            future.set_exception(RuntimeError(error))
+        return future, lambda result: future.set_result(self.api_stats()), failed
+
+    def api_open_folder(self, path):
+        if not os.path.isdir(path):
+            raise ValueError(f"Not a folder: {path}")
+        self.api_check_unsaved()
+        future, finished, failed = self.api_list_callbacks()
+        if not self.open_folder(path, interactive=False, on_finished=finished, on_failed=failed):
+            raise RuntimeError("Another operation is still running")
+        return future
+
+    def api_refresh(self):
+        folder_path = self.api_folder()
+        self.api_check_unsaved()
+        future, finished, failed = self.api_list_callbacks()
+        if not self.populate_file_list(folder_path, finished, failed):
+            raise RuntimeError("Another operation is still running")
+        return future
+
+    def api_query(self, search=None, filter=None, offset=0, limit=1000):
+        """Rows matching a caption search and/or metadata filter, in natural name order"""
+        folder_path = self.api_folder()
+        clauses = self.metadata_index.parse_filter(filter or "")
+        entries = sorted((entry for entry in self.metadata_index.entries.values()
+                          if self.metadata_index.matches(entry, clauses)), key=lambda entry: entry['sort_key'])
+
+        def page(entries):
+            keys = ['name', 'image_name', 'width', 'height', 'aspect', 'megapixels', 'format', 'file_size',
+                    'caption_length', 'caption_hash', 'lint']
+            rows = [{key: entry.get(key) for key in keys} for entry in entries[offset:offset + limit]]
+            return {'total': len(entries), 'rows': rows}
+
+        if search and self.project_db:
+            matches = self.project_db.search(search)
+            entries = [entry for entry in entries if entry['name'] in matches]
+        elif search:
+            # Without a database every caption is read, so that happens off the Qt thread
+            def search_captions():
+                texts = self.file_io.read_texts([os.path.join(folder_path, entry['name']) for entry in entries])
+                return page([entry for entry in entries
+                             if search.lower() in texts.get(os.path.join(folder_path, entry['name']), "").lower()])
+            return self.api_reader.submit(search_captions)
+        return page(entries)
+
+    def api_read_captions(self, files):
+        folder_path = self.api_folder()
+        paths = [os.path.join(folder_path, name) for name in self.api_file_names(files)]
+
+        def read():
+            texts = self.file_io.read_texts(paths)
+            return {os.path.basename(path): texts.get(path) for path in paths}
+        return self.api_reader.submit(read)
+
+    def api_write_captions(self, captions):
+        self.api_file_names(list(captions))
+        return self.api_edit(list(captions), "api_write_captions", None, dict(captions),
+                             "Wrote {count} captions from the automation API.")
+
+    def api_apply_trigger(self, trigger, files=None):
+        trigger = trigger.strip()
+        if not trigger:
+            raise ValueError("Trigger is empty")
+        return self.api_edit(self.api_file_names(files), "api_apply_trigger", trigger,
+                             lambda content: f"{trigger} {content}",
+                             f"Applied trigger '{trigger}' to {{count}} text files from the automation API.")
+
+    def api_replace(self, find, replace, files=None):
+        if not find:
+            raise ValueError("Find text is empty")
+        return self.api_edit(self.api_file_names(files), "api_replace", f"{find} -> {replace}",
+                             lambda content: content.replace(find, replace),
+                             f"Replaced '{find}' with '{replace}' in {{count}} of {{total}} files from the automation API.")
+
+    def api_stats(self):
+        folder_path = self.api_folder()
+        entries = self.metadata_index.entries.values()
+        lint_counts = Counter(code for entry in entries for code in (entry.get('lint') or ()))
+        return {
+            'folder': folder_path,
+            'files': len(self.metadata_index.entries),
+            'with_images': sum(1 for entry in entries if entry.get('image_name')),
+            'empty_captions': sum(1 for entry in entries if entry.get('caption_length') == 0),
+            'caption_characters': sum(entry.get('caption_length') or 0 for entry in entries),
+            'formats': dict(Counter(entry['format'] for entry in entries if entry.get('format'))),
+            'lint': dict(lint_counts) if self.lint_context is not None else None,
+            'project_database': self.project_db is not None,
+        }
+
+    def preprocess_images(self):
+        folder_path = self.folder_label.text()
+        if not os.path.isdir(folder_path):
+            self.statusBar.showMessage("Please select a valid folder.", 3000)
+            return
+
+        resolution, ok = QInputDialog.getInt(self, "Bucket Resolution", "Base resolution (bucket area = resolution²):",
+                                             1024, 64, 8192, 64)
+        if not ok:
+            return
+        max_side, ok = QInputDialog.getInt(self, "Maximum Side", "Cap the longest side of any bucket at:",
+                                           resolution * 2, 64, 16384, 64)
+        if not ok:
+            return
+        mode_choice, ok = QInputDialog.getItem(self, "Resize Mode", "Fit images into their bucket by:",
+                                               ["Center-crop to bucket", "Resize to fit (no crop)"], 0, False)
+        if not ok:
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, "Select Output Folder")
+        if not output_dir:
+            return
+        if os.path.abspath(output_dir) == os.path.abspath(folder_path):
+            QMessageBox.warning(self, "Warning", "Please choose an output folder other than the current folder.")
+            return
+
+        def show_report(result):
+            report = format_bucket_report(result)
+            self.statusBar.showMessage(report.splitlines()[-1], 5000)
+            QMessageBox.information(self, "Bucket Counts", report.replace("\n", "<br>"))
+
+        self.run_background_job("Preprocessing images", run_preprocess, show_report,
+                                source_dir=folder_path, output_dir=output_dir, resolution=resolution,
+                                max_side=max_side, mode='crop' if mode_choice.startswith("Center") else 'fit')
 
     def natural_sort_key(self, s):
         """Sort strings containing numbers in human order"""
-        return [int(text) if text.isdigit() else text.lower()
-                for text in re.split('([0-9]+)', s)]
+        return natural_sort_key(s)
 
-    def populate_file_list(self, folder_path):
-        self.file_list.clear()
-        files = [f for f in os.listdir(folder_path) if f.endswith(".txt")]
-        
-        # Sort files using natural sort
-        files.sort(key=self.natural_sort_key)
-        
-        self.file_list.addItems(files)
+    def populate_file_list(self, folder_path, on_finished=None, on_failed=None, reindex=False):
+        """Bring the metadata index up to date with the folder in a background job, then show it.
 
-        # Automatically select the first file in the list
-        if files:
-            self.file_list.setCurrentRow(0)
-            self.on_file_select()
+        Opening a folder with a project database shows the stored rows straight away, so a large
+        dataset can be browsed while its files are checked for changes. on_finished gets the
+        index_folder result once the list is up to date. reindex starts from an empty index, e.g. to
+        fill a new project database, while the list keeps its rows. Returns the job, or None if
+        another one is running.
+        """
+        if self.background_job:
+            self.statusBar.showMessage("Another operation is still running.", 3000)
+            return None
+
+        if not self.metadata_index.entries and self.project_db:
+            try:
+                self.file_model.show_database(self.project_db, self.sort_column, self.sort_order)
+                self.select_first_file()
+            except sqlite3.Error as e:
+                self.statusBar.showMessage(f"Failed to read project database: {e}", 3000)
+
+        def show_index(result):
+            self.metadata_index.entries = result['entries']
+            if self.lint_context is not None:
+                self.apply_lint_cache()
+            if (self.sort_column, self.sort_order) == sort:
+                self.list_entries = result['sorted']
+                self.filter_file_list()
+            else:
+                self.show_list_entries()  # The sort order changed while the job ran
+            if result['created']:
+                self.statusBar.showMessage(f"Created {len(result['created'])} missing text files.", 3000)
+            if result['database_error']:
+                self.statusBar.showMessage(f"Failed to update project database: {result['database_error']}", 3000)
+            self.publish_event({'event': 'folder_refreshed', 'folder': folder_path,
+                                'files': len(self.metadata_index.entries)})
+
+            if self.current_file_name() is None and self.current_file:
+                # The open caption was not listed before, e.g. it was just renamed
+                name = os.path.basename(self.current_file)
+                self.select_names({name}, name)
+            # The open caption is reloaded in case it changed on disk, unless it has edits of its own
+            if self.current_file_name() is None:
+                self.select_first_file()
+            elif not self.unsaved_changes:
+                self.on_file_select(force_reload=True)
+            if on_finished:
+                on_finished(result)
+
+        def report_failure(error):
+            self.show_list_entries()
+            if on_failed:
+                on_failed(error)
+            else:
+                QMessageBox.critical(self, "Error", f"Failed to read folder: {error}")
+
+        sort = (self.sort_column, self.sort_order)
+        return self.run_background_job("Reading folder", index_folder, show_index, report_failure, modal=False,
+                                       folder_path=folder_path, entries={} if reindex else self.metadata_index.entries,
+                                       fs=self.file_io.fs, use_database=self.project_db is not None,
+                                       sort_column=sort[0], sort_order=sort[1])
+
+    def show_list_entries(self):
+        """Sort the index entries on the current column, then show the ones passing the filters"""
+        self.list_entries = FileListModel.sorted_entries(self.metadata_index.entries.values(),
+                                                         self.sort_column, self.sort_order)
+        self.filter_file_list()
+
+    def reset_file_list(self, show):
+        """Call show to reset the list model, then restore the selection, current row and scroll position"""
+        selected = set(self.selected_file_names())
+        current = self.current_file_name()
+        scroll_position = self.file_list.verticalScrollBar().value()
+        show()
+        self.select_names(selected, current)
+        self.file_list.verticalScrollBar().setValue(scroll_position)
+
+    def sort_file_list(self, column, order):
+        self.sort_column, self.sort_order = column, order
+        if self.file_model.database:
+            # Still serving rows from the database, so SQLite sorts them
+            self.reset_file_list(lambda: self.file_model.show_database(self.project_db, column, order))
+        else:
+            self.show_list_entries()
+
+    def current_file_name(self):
+        index = self.file_list.currentIndex()
+        return self.file_model.name(index.row()) if index.isValid() else None
+
+    def select_first_file(self):
+        if self.file_model.rowCount():
+            self.file_list.setCurrentIndex(self.file_model.index(0, 0))
+            self.on_file_select(force_reload=True)
+
+    def select_names(self, names, current=None):
+        """Select the rows of the named files, built as contiguous ranges, and make current's row the current one"""
+        model = self.file_model
+        last_column = model.columnCount() - 1
+        selection = QItemSelection()
+        range_start = None
+        row_count = model.rowCount() if names else 0
+        for row in range(row_count + 1):
+            selected = row < row_count and model.name(row) in names
+            if selected and range_start is None:
+                range_start = row
+            elif not selected and range_start is not None:
+                selection.select(model.index(range_start, 0), model.index(row - 1, last_column))
+                range_start = None
+
+        selection_model = self.file_list.selectionModel()
+        current_row = model.row_of(current) if current else None
+        if current_row is not None:
+            selection_model.setCurrentIndex(model.index(current_row, 0), QItemSelectionModel.NoUpdate)
+        selection_model.select(selection, QItemSelectionModel.ClearAndSelect)
 
     def find_associated_image(self, base_name):
         folder_path = self.folder_label.text()
+
+        # The metadata index already knows the image from its folder listing, so no stat calls are needed
+        entry = self.metadata_index.entries.get(base_name + ".txt")
+        if entry:
+            return os.path.join(folder_path, entry['image_name']) if entry['image_name'] else None
+
         for ext in ['.png', '.jpg', '.jpeg']:
             image_path = os.path.join(folder_path, base_name + ext)
             if os.path.exists(image_path):
@@ -403,19 +2723,44 @@ class FileEditorApp(QMainWindow):
             try:
                 with open(self.current_file, "w") as file:
                     file.write(content)
+                self.file_io.invalidate(self.current_file)
+                self.publish_event({'event': 'captions_changed', 'operation': 'save',
+                                    'files': [os.path.basename(self.current_file)]})
                 self.statusBar.showMessage("File saved successfully.", 3000)
                 self.unsaved_changes = False
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to save file: {e}")
+                return
+
+            # The caption is already on disk, so a database error is only reported, not treated as a failed save
+            if self.project_db:
+                try:
+                    self.project_db.record_edit("save", None, {os.path.basename(self.current_file): content})
+                except sqlite3.Error as e:
+                    self.statusBar.showMessage(f"Saved, but failed to update project database: {e}", 3000)
         else:
             QMessageBox.warning(self, "Warning", "No file is currently open.")
 
+    def read_caption(self, file_name):
+        """Caption text for a listed file, served from the prefetch cache while the file is unchanged on disk"""
+        return self.file_io.read_text(os.path.join(self.folder_label.text(), file_name))
+
+    def prefetch_visible_captions(self):
+        """Read the captions of the rows in view (and the page below) ahead of time"""
+        first = self.file_list.indexAt(QPoint(0, 0))
+        if not first.isValid():
+            return
+        # Rows all have the same height, so the rows in view follow from the first one
+        row_height = max(1, self.file_list.visualRect(first).height())
+        last = min(self.file_model.rowCount(), first.row() + self.file_list.viewport().height() * 2 // row_height + 1)
+        folder_path = self.folder_label.text()
+        self.file_io.prefetch([os.path.join(folder_path, self.file_model.name(row)) for row in range(first.row(), last)])
+
     def load_file_content(self):
         if self.current_file:
-            with open(self.current_file, "r") as file:
-                content = file.read()
-                self.editor.setText(content)
-            
+            content = self.read_caption(os.path.basename(self.current_file))
+            self.editor.setText(content)
+
             # Reset unsaved changes flag after loading content
             self.unsaved_changes = False
 
@@ -436,9 +2781,14 @@ class FileEditorApp(QMainWindow):
         if not name_structure:
             self.statusBar.showMessage("Please enter a naming structure.", 3000)
             return
+        if self.background_job:
+            self.statusBar.showMessage("Another operation is still running.", 3000)
+            return
 
-        image_files = [f for f in os.listdir(folder_path) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-        text_files = [f for f in os.listdir(folder_path) if f.lower().endswith('.txt')]
+        # One directory listing instead of two, since each one is a round trip on a network share
+        folder_files = os.listdir(folder_path)
+        image_files = [f for f in folder_files if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+        text_files = {f for f in folder_files if f.lower().endswith('.txt')}
 
         if not image_files:
             self.statusBar.showMessage("No image files found in the specified folder.", 3000)
@@ -452,43 +2802,60 @@ class FileEditorApp(QMainWindow):
         total_files = len(image_files)
         index_format = f"{{:0{len(str(total_files))}d}}"
 
+        # Renames within each step are independent, so each step runs as one concurrent batch
         # Step 1: Rename to temporary names
         temp_mappings = []  # Store original and temp names
+        temp_renames = []
         for index, image_name in enumerate(image_files, start=1):
             base_name, image_ext = os.path.splitext(image_name)
             temp_image_name = f"temp_{index_format.format(index)}{image_ext}"
             
             old_image_path = os.path.join(folder_path, image_name)
             temp_image_path = os.path.join(folder_path, temp_image_name)
-            os.rename(old_image_path, temp_image_path)
+            temp_renames.append((old_image_path, temp_image_path))
             
             corresponding_text_file = f"{base_name}.txt"
             if corresponding_text_file in text_files:
                 temp_text_name = f"temp_{index_format.format(index)}.txt"
                 old_text_path = os.path.join(folder_path, corresponding_text_file)
                 temp_text_path = os.path.join(folder_path, temp_text_name)
-                os.rename(old_text_path, temp_text_path)
+                temp_renames.append((old_text_path, temp_text_path))
                 
                 # Store the mapping for both image and text files
                 temp_mappings.append((temp_image_name, temp_text_name, index))
 
         # Step 2: Rename from temporary names to final names
+        final_renames = []
         for temp_image_name, temp_text_name, index in temp_mappings:
             # Rename image file
             final_image_name = f"{name_structure}{index_format.format(index)}{os.path.splitext(temp_image_name)[1]}"
             temp_image_path = os.path.join(folder_path, temp_image_name)
             final_image_path = os.path.join(folder_path, final_image_name)
-            os.rename(temp_image_path, final_image_path)
+            final_renames.append((temp_image_path, final_image_path))
 
             # Rename text file
             final_text_name = f"{name_structure}{index_format.format(index)}.txt"
             temp_text_path = os.path.join(folder_path, temp_text_name)
             final_text_path = os.path.join(folder_path, final_text_name)
-            os.rename(temp_text_path, final_text_path)
-
-            # Update current file if it was renamed
-            if self.current_file == temp_text_path:
-                self.current_file = final_text_path
+            final_renames.append((temp_text_path, final_text_path))
+
+        # Record where every file ends up before touching anything, so the rename can be rolled back
+        final_paths = dict(final_renames)
+        snapshot = self.snapshot_store(folder_path).begin("rename_files", name_structure)
+        for old_path, temp_path in temp_renames:
+            snapshot.add_rename(os.path.basename(old_path), os.path.basename(final_paths.get(temp_path, temp_path)))
+            # The open caption follows its file to the new name
+            if self.current_file == old_path:
+                self.current_file = final_paths.get(temp_path, temp_path)
+
+        try:
+            self.file_io.rename_many(temp_renames)
+            self.file_io.rename_many(final_renames)
+        finally:
+            try:
+                snapshot.save()
+            except OSError as e:
+                QMessageBox.warning(self, "Warning", f"The rollback snapshot for this rename could not be saved: {e}")
 
         self.statusBar.showMessage(f"Renamed {total_files} image files and their associated text files.", 3000)
         self.populate_file_list(folder_path)
@@ -508,56 +2875,103 @@ class FileEditorApp(QMainWindow):
 
         text_files = [f for f in os.listdir(folder_path) if f.lower().endswith('.txt')]
 
-        for file_name in text_files:
-            file_path = os.path.join(folder_path, file_name)
-            with open(file_path, "r+") as file:
-                content = file.read()
-                file.seek(0, 0)
-                file.write(f"{trigger} {content}")
-                file.truncate()
+        self.edit_captions_in_background(text_files, "apply_trigger_to_all", trigger,
+                                         lambda content: f"{trigger} {content}",
+                                         f"Applied trigger '{trigger}' to {{count}} text files.")
 
-        self.statusBar.showMessage(f"Applied trigger '{trigger}' to all text files.", 3000)
-        self.populate_file_list(folder_path)
-        self.load_file_content()  # Refresh editor
+    def selected_file_names(self):
+        """Names of the selected rows; rows hidden by the filters are not in the list at all"""
+        rows = dict.fromkeys(row for selection_range in self.file_list.selectionModel().selection()
+                             for row in range(selection_range.top(), selection_range.bottom() + 1))
+        return [self.file_model.name(row) for row in rows]
+
+    def select_all_visible(self):
+        # Only the rows passing the filters are in the model, so this is one range
+        self.file_list.selectAll()
+        self.statusBar.showMessage(f"Selected {self.file_model.rowCount()} files.", 3000)
+
+    def edit_captions_in_background(self, file_names, operation, details, transform, done_message,
+                                    on_finished=None, on_failed=None):
+        """Run transform over the given captions as one background job; returns the job, or None if not started.
+
+        on_finished gets the edit_captions result, on_failed the error message if the job fails.
+        """
+        if self.background_job:
+            self.statusBar.showMessage("Another operation is still running.", 3000)
+            return None
+
+        if not file_names:
+            self.statusBar.showMessage("No file selected.", 3000)
+            return None
+
+        folder_path = self.folder_label.text()
+
+        def apply_result(result):
+            updates = result['updates']
+            # Only the edited rows and their cache entries are touched, not the whole list
+            self.metadata_index.update_captions(updates)
+            for file_name, update in updates.items():
+                file_path = os.path.join(folder_path, file_name)
+                self.file_io.store_text(file_path, update['text_stat'], update['caption'])
+                entry = self.metadata_index.entries.get(file_name)
+                if entry and self.lint_context is not None:
+                    entry['lint'] = lint_caption(update['data'], list(LINT_RULES), self.lint_context)
+                    self.lint_cache[update['caption_hash']] = entry['lint']
+            self.file_model.refresh_names(updates)
+            if self.project_db and updates:
+                try:
+                    self.project_db.record_edit(operation, details,
+                                                {name: update['caption'] for name, update in updates.items()},
+                                                self.metadata_index.entries)
+                except sqlite3.Error as e:
+                    self.statusBar.showMessage(f"Failed to update project database: {e}", 3000)
+
+            for file_name, error in result['errors']:
+                print(f"Failed to edit {file_name}: {error}")
+            message = done_message.format(count=len(updates), total=result['total'])
+            if result['cancelled']:
+                message += " (cancelled)"
+            if result['errors']:
+                message += f" {len(result['errors'])} files failed."
+            if result['snapshot_error']:
+                message += f" The rollback snapshot could not be saved: {result['snapshot_error']}"
+            self.statusBar.showMessage(message, 5000)
+
+            if self.current_file and os.path.basename(self.current_file) in updates:
+                self.load_file_content()  # Refresh editor
+
+            if updates:
+                self.publish_event({'event': 'captions_changed', 'operation': operation, 'files': list(updates)})
+            if on_finished:
+                on_finished(result)
 
-    def apply_trigger_to_selected(self):
         self.unsaved_changes = False  # Temporarily disable unsaved changes check
+        # The original of every caption that changes is kept, so the whole operation can be rolled back
+        snapshot = self.snapshot_store(folder_path).begin(operation, details)
+        return self.run_background_job("Editing captions", edit_captions, apply_result, on_failed,
+                                folder_path=folder_path, file_names=file_names, transform=transform,
+                                file_io=self.file_io, snapshot=snapshot)
+
+    def apply_trigger_to_selected(self):
         trigger = self.trigger_entry.text().strip()
         if not trigger:
             self.statusBar.showMessage("Please enter a trigger word.", 3000)
             return
 
-        if not self.current_file:
-            self.statusBar.showMessage("No file selected.", 3000)
-            return
-
-        with open(self.current_file, "r+") as file:
-            content = file.read()
-            file.seek(0, 0)
-            file.write(f"{trigger} {content}")
-            file.truncate()
-
-        self.statusBar.showMessage(f"Applied trigger '{trigger}' to the selected text file.", 3000)
-        self.load_file_content()  # Refresh editor
+        self.edit_captions_in_background(self.selected_file_names(), "apply_trigger_to_selected", trigger,
+                                    lambda content: f"{trigger} {content}",
+                                    f"Applied trigger '{trigger}' to {{count}} selected text files.")
 
     def replace_in_selected(self):
-        self.unsaved_changes = False  # Temporarily disable unsaved changes check
         find_text = self.find_entry.text()
         replace_text = self.replace_entry.text()
-
-        if not self.current_file:
-            self.statusBar.showMessage("No file selected.", 3000)
+        if not find_text:
+            self.statusBar.showMessage("Please enter text to find.", 3000)
             return
 
-        with open(self.current_file, "r+") as file:
-            content = file.read()
-            new_content = content.replace(find_text, replace_text)
-            file.seek(0)
-            file.write(new_content)
-            file.truncate()
-
-        self.statusBar.showMessage(f"Replaced '{find_text}' with '{replace_text}' in the selected file.", 3000)
-        self.load_file_content()  # Refresh editor
+        self.edit_captions_in_background(self.selected_file_names(), "replace_in_selected", f"{find_text} -> {replace_text}",
+                                    lambda content: content.replace(find_text, replace_text),
+                                    f"Replaced '{find_text}' with '{replace_text}' in {{count}} of {{total}} selected files.")
 
     def replace_in_all(self):
         self.unsaved_changes = False  # Temporarily disable unsaved changes check
@@ -569,38 +2983,46 @@ class FileEditorApp(QMainWindow):
             self.statusBar.showMessage("Please select a valid folder.", 2000)
             return
 
-        text_files = [f for f in os.listdir(folder_path) if f.lower().endswith('.txt')]
+        if not find_text:
+            self.statusBar.showMessage("Please enter text to find.", 3000)
+            return
 
-        for file_name in text_files:
-            file_path = os.path.join(folder_path, file_name)
-            try:
-                with open(file_path, "r+") as file:
-                    content = file.read()
-                    new_content = content.replace(find_text, replace_text)
-                    file.seek(0)
-                    file.write(new_content)
-                    file.truncate()
-            except Exception as e:
-                self.statusBar.showMessage(f"Failed to replace text in {file_name}: {e}", 3000)
-                return  # Exit the method if an error occurs
+        text_files = [f for f in os.listdir(folder_path) if f.lower().endswith('.txt')]
 
-        self.statusBar.showMessage(f"Replaced '{find_text}' with '{replace_text}' in all files.", 3000)
-        self.populate_file_list(folder_path)
-        self.load_file_content()  # Refresh editor
+        self.edit_captions_in_background(text_files, "replace_in_all", f"{find_text} -> {replace_text}",
+                                         lambda content: content.replace(find_text, replace_text),
+                                         f"Replaced '{find_text}' with '{replace_text}' in {{count}} of {{total}} files.")
 
     def filter_file_list(self):
+        """Show the sorted index entries that pass the caption search and metadata filter"""
+        if self.file_model.database and self.background_job:
+            return  # Filters apply once the folder has been read into the index and the rows are in memory
         filter_text = self.filter_entry.text().lower()
         folder_path = self.folder_label.text()
 
-        for index in range(self.file_list.count()):
-            item = self.file_list.item(index)
-            file_name = item.text()
-            file_path = os.path.join(folder_path, file_name)
+        try:
+            clauses = self.metadata_index.parse_filter(self.metadata_filter_entry.text())
+        except ValueError as e:
+            self.statusBar.showMessage(f"Invalid metadata filter: {e}", 3000)
+            return
+
+        entries = self.list_entries
+        if clauses:
+            entries = [entry for entry in entries if self.metadata_index.matches(entry, clauses)]
+
+        if filter_text and entries:
+            if self.project_db:
+                # With a project database the caption search is a single FTS5 query instead of reading every file
+                search_matches = self.project_db.search(filter_text)
+                entries = [entry for entry in entries if entry['name'] in search_matches]
+            else:
+                # Otherwise unchanged captions come from the cache and the rest are read concurrently
+                texts = self.file_io.read_texts([os.path.join(folder_path, entry['name']) for entry in entries])
+                entries = [entry for entry in entries
+                           if filter_text in (texts.get(os.path.join(folder_path, entry['name'])) or "").lower()]
 
-            if os.path.exists(file_path):
-                with open(file_path, "r") as file:
-                    content = file.read().lower()
-                    item.setHidden(filter_text not in content)
+        self.reset_file_list(lambda: self.file_model.show_entries(entries))
+        self.prefetch_visible_captions()
 
     def dark_mode_stylesheet(self):
         return """
@@ -644,7 +3066,7 @@ class FileEditorApp(QMainWindow):
             border: 1px solid #5a5a5a;
             border-radius: 0px;  /* Ensure square corners */
         }
-        QListWidget {
+        QListWidget, QTableView, QHeaderView::section {
             background-color: #3e3e3e;
             color: #ffffff;
         }
@@ -696,7 +3118,7 @@ class FileEditorApp(QMainWindow):
             border: 1px solid #c0c0c0;
             border-radius: 0px;  /* Ensure square corners */
         }
-        QListWidget {
+        QListWidget, QTableView, QHeaderView::section {
             background-color: #ffffff;
             color: #000000;
         }
@@ -718,6 +3140,12 @@ class FileEditorApp(QMainWindow):
         self.save_action.setShortcut(QKeySequence.Save)
         self.save_action.triggered.connect(self.save_file)
 
+        # Create project database toggle
+        self.project_db_action = file_menu.addAction('Use Project Database for This Folder')
+        self.project_db_action.setCheckable(True)
+        self.project_db_action.setEnabled(False)
+        self.project_db_action.triggered.connect(self.toggle_project_database)
+
         # Create a 'View' menu
         view_menu = menu_bar.addMenu('View')
 
@@ -731,6 +3159,24 @@ class FileEditorApp(QMainWindow):
         decrease_font_action.setShortcut(QKeySequence.ZoomOut)
         decrease_font_action.triggered.connect(self.decrease_font_size)
 
+        # Create a 'Tools' menu
+        tools_menu = menu_bar.addMenu('Tools')
+
+        # Add 'Bucket and Resize' action
+        self.preprocess_action = tools_menu.addAction('Bucket and Resize Images...')
+        self.preprocess_action.triggered.connect(self.preprocess_images)
+
+        # Add lint actions
+        lint_action = tools_menu.addAction('Lint Captions')
+        lint_action.triggered.connect(self.lint_captions)
+
+        fix_lint_action = tools_menu.addAction('Fix Lint Findings...')
+        fix_lint_action.triggered.connect(self.fix_lint_findings)
+
+        # Add 'Roll Back' action
+        rollback_action = tools_menu.addAction('Roll Back Bulk Operation...')
+        rollback_action.triggered.connect(self.rollback_operation)
+
         # Create a 'Help' menu
         help_menu = menu_bar.addMenu('Help')
 
@@ -753,16 +3199,19 @@ class FileEditorApp(QMainWindow):
             increase_font = "Cmd++"
             decrease_font = "Cmd+-"
             toggle_focus = "Cmd+E"
+            select_visible = "Cmd+Shift+A"
         else:  # Windows and Linux
             save_shortcut = "Ctrl+S"
             increase_font = "Ctrl++"
             decrease_font = "Ctrl+-"
             toggle_focus = "Ctrl+E"
+            select_visible = "Ctrl+Shift+A"
 
         shortcuts_text = f"""
         <b>Keyboard Shortcuts:</b><br>
         <ul style="list-style-type:none;">
             <li style="margin-bottom: 8px;">🔄 <b>Toggle (File List/Editor):</b> {toggle_focus}</li>
+            <li style="margin-bottom: 8px;">☑️ <b>Select All Visible Files:</b> {select_visible}</li>
             <li style="margin-bottom: 8px;">🔍 <b>Increase Font Size:</b> {increase_font}</li>
             <li style="margin-bottom: 8px;">🔎 <b>Decrease Font Size:</b> {decrease_font}</li>
             <li style="margin-bottom: 8px;">💾 <b>Save:</b> {save_shortcut}</li>
@@ -788,10 +3237,23 @@ class FileEditorApp(QMainWindow):
         file_list_font = self.file_list.font()
         file_list_font.setPointSize(file_list_font.pointSize() + delta)
         self.file_list.setFont(file_list_font)
+        self.fit_file_list_rows()
 
         # Note: Text fields are no longer adjusted
 
-    def on_file_select(self):
+    def fit_file_list_rows(self):
+        # Rows have a fixed height, so it follows the font by hand
+        self.file_list.verticalHeader().setDefaultSectionSize(self.file_list.fontMetrics().height() + 6)
+
+    def on_file_select(self, force_reload=False):
+        # With several rows selected the editor follows the current row
+        index = self.file_list.currentIndex()
+        if not index.isValid() or not self.file_list.selectionModel().isRowSelected(index.row(), QModelIndex()):
+            return
+        file_path = os.path.join(self.folder_label.text(), self.file_model.name(index.row()))
+        if file_path == self.current_file and not force_reload:
+            return
+
         if self.unsaved_changes:
             reply = QMessageBox.question(self, 'Unsaved Changes',
                                          "You have unsaved changes. Are you sure you want to switch files?",
@@ -799,24 +3261,85 @@ class FileEditorApp(QMainWindow):
             if reply == QMessageBox.No:
                 return
 
-        selected_items = self.file_list.selectedItems()
-        if selected_items:
-            file_name = selected_items[0].text()
-            self.current_file = os.path.join(self.folder_label.text(), file_name)
-            self.load_file_content()
+        self.current_file = file_path
+        self.load_file_content()
 
     def refresh_folder(self):
         folder_path = self.folder_label.text()
         if folder_path and os.path.isdir(folder_path):
-            self.check_and_offer_image_conversion(folder_path)  # Check for unsupported formats
-            self.populate_file_list(folder_path)  # Refresh the file list after conversion
-            self.statusBar.showMessage("Folder refreshed.", 3000)
+            def finish(result):
+                if not result['created'] and not result['database_error']:
+                    self.statusBar.showMessage("Folder refreshed.", 3000)
+                # The listing shows whether there are unsupported formats to offer converting
+                self.check_and_offer_image_conversion(folder_path, result['convertible'])
+
+            self.populate_file_list(folder_path, finish)
+
+    def closeEvent(self, event):
+        if self.automation_server:
+            self.automation_server.stop()
+            self.automation_server = None
+        self.api_reader.shutdown(wait=False)
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Quick Caption Editor")
     parser.add_argument('--light-mode', action='store_true', help='Enable light mode')
+    parser.add_argument('--preprocess', metavar='FOLDER', help='Bucket and resize FOLDER without opening the GUI')
+    parser.add_argument('--output', metavar='FOLDER', help='Output folder for --preprocess')
+    parser.add_argument('--resolution', type=int, default=1024, help='Bucket base resolution for --preprocess')
+    parser.add_argument('--max-side', type=int, help='Longest allowed bucket side for --preprocess')
+    parser.add_argument('--mode', choices=['crop', 'fit'], default='crop', help='Center-crop to bucket or resize to fit')
+    parser.add_argument('--workers', type=int, help='Number of worker processes for --preprocess')
+    parser.add_argument('--snapshot-max-mb', type=float, default=SNAPSHOT_MAX_BYTES / (1024 * 1024), help='Size budget for bulk operation snapshots')
+    parser.add_argument('--snapshot-max-days', type=float, default=SNAPSHOT_MAX_AGE_DAYS, help='Age budget for bulk operation snapshots')
+    parser.add_argument('--api-port', type=int, help='Serve the automation API on 127.0.0.1:PORT (0 picks a free port)')
+    parser.add_argument('--api-socket', metavar='PATH', help='Serve the automation API on a Unix socket instead')
+    parser.add_argument('--api-call', metavar='METHOD', help='Call METHOD on a running editor\'s automation API and print the result')
+    parser.add_argument('--api-params', default='{}', help='JSON object of parameters for --api-call')
+    parser.add_argument('--api-token-file', default=API_TOKEN_PATH, help='File holding the automation API token')
+    parser.add_argument('--benchmark-io', action='store_true', help='Benchmark file access against simulated network latency')
+    parser.add_argument('--latency', type=float, default=5, help='Simulated per-call latency in ms for --benchmark-io')
+    parser.add_argument('--files', type=int, default=300, help='Number of caption files for --benchmark-io')
     args = parser.parse_args()
 
+    if args.api_call:
+        if args.api_port is None and not args.api_socket:
+            parser.error("--api-call requires --api-port or --api-socket")
+        try:
+            client = AutomationClient(port=args.api_port, socket_path=args.api_socket, token_path=args.api_token_file)
+        except OSError as e:
+            sys.exit(f"Could not connect to the editor: {e}")
+        try:
+            print(json.dumps(client.call(args.api_call, **json.loads(args.api_params)), indent=2))
+        except RuntimeError as e:
+            sys.exit(f"Error: {e}")
+        finally:
+            client.close()
+        sys.exit(0)
+
+    if args.benchmark_io:
+        print(f"{args.files} files, {args.latency:g} ms per file system call")
+        print(f"{'Operation':<26}{'Sequential':>12}{'Batched':>12}{'Speedup':>10}")
+        for name, sequential, batched in run_io_benchmark(args.files, args.latency / 1000):
+            print(f"{name:<26}{sequential:>11.2f}s{batched:>11.2f}s{sequential / batched:>9.1f}x")
+        sys.exit(0)
+
+    if args.preprocess:
+        if not args.output:
+            parser.error("--preprocess requires --output")
+
+        def print_progress(done, total):
+            print(f"\r{done}/{total}", end="", flush=True)
+
+        result = run_preprocess(args.preprocess, args.output, resolution=args.resolution, max_side=args.max_side,
+                                mode=args.mode, max_workers=args.workers, progress=print_progress)
+        print()
+        for image_name, error in result['errors']:
+            print(f"Failed to process {image_name}: {error}")
+        print(format_bucket_report(result))
+        sys.exit(1 if result['errors'] else 0)
+
     # Enable high-DPI scaling
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
@@ -826,6 +3349,11 @@ if __name__ == "__main__":
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
 
     app = QApplication(sys.argv)
-    window = FileEditorApp(dark_mode=not args.light_mode)  # Default to dark mode
+    window = FileEditorApp(dark_mode=not args.light_mode,  # Default to dark mode
+                           snapshot_max_bytes=int(args.snapshot_max_mb * 1024 * 1024),
+                           snapshot_max_age_days=args.snapshot_max_days)
+    if args.api_port is not None or args.api_socket:
+        address = window.start_automation_server(args.api_port or 0, args.api_socket, args.api_token_file)
+        print(f"Automation API listening on {address}, token in {args.api_token_file}")
     window.show()
     sys.exit(app.exec_())
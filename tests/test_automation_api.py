@@ -0,0 +1,226 @@
+"""Drive an offscreen FileEditorApp through its automation API with AutomationClient.
+
+Handlers run on the Qt thread, so each client call runs on a helper thread while the test
+thread keeps processing Qt events.
+"""
+import json
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication, QMessageBox  # noqa: E402
+
+import app  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for index in range(5):
+        (tmp_path / f"img{index}.txt").write_text(f"cat, dog {index}")
+    return tmp_path
+
+
+@pytest.fixture
+def dialogs(monkeypatch):
+    """Record any modal dialog instead of blocking on it; API calls must never open one"""
+    shown = []
+    for name in ("critical", "warning", "information"):
+        monkeypatch.setattr(QMessageBox, name, staticmethod(lambda *args, name=name: shown.append((name, args[2]))))
+    monkeypatch.setattr(QMessageBox, "question",
+                        staticmethod(lambda *args: shown.append(("question", args[2])) or QMessageBox.No))
+    return shown
+
+
+@pytest.fixture
+def token_path(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("api") / "token")
+
+
+@pytest.fixture
+def editor(qapp, dialogs, token_path):
+    window = app.FileEditorApp()
+    window.start_automation_server(port=0, token_path=token_path)
+    yield window
+    window.close()
+
+
+@pytest.fixture
+def client(editor, token_path):
+    automation_client = app.AutomationClient(port=editor.automation_server.port, timeout=30, token_path=token_path)
+    yield automation_client
+    automation_client.close()
+
+
+def run(qapp, function, timeout=60):
+    """Run a blocking client call on a helper thread while processing Qt events here"""
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = function()
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while thread.is_alive():
+        qapp.processEvents()
+        time.sleep(0.005)
+        assert time.monotonic() < deadline, "API call did not answer"
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+def test_batch_is_answered_in_order(qapp, editor, client, folder):
+    run(qapp, lambda: client.call("open_folder", path=str(folder)))
+
+    responses = run(qapp, lambda: client.batch([
+        ("read_captions", {"files": ["img1.txt"]}),
+        ("bogus", {}),
+        ("stats", {}),
+    ]))
+
+    assert [response['id'] for response in responses] == sorted(response['id'] for response in responses)
+    assert responses[0]['result'] == {"img1.txt": "cat, dog 1"}
+    assert responses[1]['error'] == "Unknown method: bogus"
+    assert responses[2]['result']['files'] == 5
+
+
+def test_edits_publish_events(qapp, editor, client, folder):
+    run(qapp, lambda: client.call("open_folder", path=str(folder)))
+    result = run(qapp, lambda: client.call("apply_trigger", trigger="ohwx", files=["img0.txt", "img3.txt"]))
+
+    assert result['changed'] == ["img0.txt", "img3.txt"]
+    assert (folder / "img3.txt").read_text() == "ohwx cat, dog 3"
+    events = [(event['event'], event.get('operation')) for event in client.events]
+    assert ("folder_refreshed", None) in events
+    assert ("captions_changed", "api_apply_trigger") in events
+
+
+def test_large_write_is_answered(qapp, editor, client, tmp_path):
+    names = [f"image_{index:05d}.txt" for index in range(3000)]
+    for name in names:
+        (tmp_path / name).write_text("")
+    captions = {name: f"a long caption for {name}, " + "tag, " * 20 for name in names}
+    assert len(json.dumps(captions)) > 64 * 1024
+
+    run(qapp, lambda: client.call("open_folder", path=str(tmp_path)))
+    result = run(qapp, lambda: client.call("write_captions", captions=captions))
+
+    assert len(result['changed']) == 3000
+    assert (tmp_path / names[-1]).read_text() == captions[names[-1]]
+    assert run(qapp, lambda: client.call("read_captions", files=names[:2])) == {name: captions[name] for name in names[:2]}
+
+
+def test_failed_job_answers_with_an_error(qapp, editor, client, folder, dialogs, monkeypatch):
+    run(qapp, lambda: client.call("open_folder", path=str(folder)))
+
+    def fail(**kwargs):
+        raise OSError("connection to share lost")
+    monkeypatch.setattr(app, "edit_captions", fail)
+
+    with pytest.raises(RuntimeError, match="connection to share lost"):
+        run(qapp, lambda: client.call("replace", find="cat", replace="lion"))
+    assert dialogs == []
+
+    # The editor is free for the next job once the failure has been reported
+    monkeypatch.undo()
+    assert run(qapp, lambda: client.call("replace", find="cat", replace="lion"))['total'] == 5
+
+
+def test_snapshot_save_failure_keeps_the_edit(qapp, editor, client, folder, dialogs, monkeypatch):
+    run(qapp, lambda: client.call("open_folder", path=str(folder)))
+
+    def fail(store, manifest):
+        raise OSError("disk full")
+    monkeypatch.setattr(app.SnapshotStore, "write_manifest", fail)
+
+    result = run(qapp, lambda: client.call("replace", find="cat", replace="lion"))
+    assert len(result['changed']) == 5
+    assert "disk full" in result['snapshot_error']
+    assert (folder / "img4.txt").read_text() == "lion, dog 4"
+    assert editor.metadata_index.entries["img4.txt"]['caption_length'] == len("lion, dog 4")
+    assert dialogs == []
+
+
+def test_outside_edits_are_read(qapp, editor, client, folder):
+    run(qapp, lambda: client.call("open_folder", path=str(folder)))
+    assert run(qapp, lambda: client.call("read_captions", files=["img2.txt"])) == {"img2.txt": "cat, dog 2"}
+
+    (folder / "img2.txt").write_text("changed outside the editor")
+    assert run(qapp, lambda: client.call("read_captions", files=["img2.txt"])) == {
+        "img2.txt": "changed outside the editor"}
+
+
+def test_open_folder_with_unsaved_changes_is_refused(qapp, editor, client, folder, dialogs):
+    run(qapp, lambda: client.call("open_folder", path=str(folder)))
+    editor.editor.setText("typed but not saved")
+    assert editor.unsaved_changes
+
+    with pytest.raises(RuntimeError, match="unsaved changes"):
+        run(qapp, lambda: client.call("open_folder", path=str(folder)))
+    assert dialogs == []
+    assert editor.editor.toPlainText() == "typed but not saved"
+
+
+def test_malformed_and_oversized_lines(qapp, editor, client, monkeypatch):
+    client.file.write(b"not json\n")
+    client.file.flush()
+    assert run(qapp, client.receive)['error'].startswith("Invalid JSON")
+
+    # The limit is applied when the server starts, so start a second one with a small limit
+    monkeypatch.setattr(app.AutomationServer, "MAX_LINE_BYTES", 1024)
+    server = app.AutomationServer({'stats': lambda: {}})
+    server.start()
+    small_client = app.AutomationClient(port=server.port, timeout=30, token=server.token)
+    try:
+        small_client.send({'id': 1, 'method': 'stats', 'params': {'padding': "x" * 4096}})
+        assert "longer than 1024 bytes" in run(qapp, small_client.receive)['error']
+        with pytest.raises(ConnectionError):
+            small_client.receive()
+    finally:
+        small_client.close()
+        server.stop()
+
+
+def test_requests_need_the_token(qapp, editor, client, folder, token_path):
+    assert stat.S_IMODE(os.stat(token_path).st_mode) == 0o600
+
+    stranger = app.AutomationClient(port=editor.automation_server.port, timeout=30, token="guessed")
+    try:
+        with pytest.raises(RuntimeError, match="Missing or wrong API token"):
+            run(qapp, lambda: stranger.call("open_folder", path=str(folder)))
+        stranger.send({'id': 1, 'method': 'stats', 'params': {}})
+        assert run(qapp, stranger.receive)['error'] == "Missing or wrong API token"
+
+        # Events go to the client holding the token, not to the one without it
+        run(qapp, lambda: client.call("open_folder", path=str(folder)))
+        assert any(event['event'] == "folder_refreshed" for event in client.events)
+        stranger.socket.settimeout(0.2)
+        with pytest.raises(socket.timeout):
+            stranger.receive()
+    finally:
+        stranger.close()
+
+
+def test_closing_the_window_stops_the_server(qapp, editor, client, token_path):
+    editor.close()
+    assert editor.automation_server is None
+    assert not os.path.exists(token_path)
+    with pytest.raises(ConnectionError):
+        client.receive()
@@ -0,0 +1,85 @@
+"""The file list model: rows served from the project database on open, then from the index"""
+import os
+import sys
+import time
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import Qt  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+import app  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for index in range(12):
+        (tmp_path / f"img{index}.txt").write_text("cat, dog" if index % 2 else "cat")
+    return tmp_path
+
+
+def wait_for_job(qapp, window, timeout=30):
+    deadline = time.monotonic() + timeout
+    while window.background_job:
+        qapp.processEvents()
+        time.sleep(0.005)
+        assert time.monotonic() < deadline, "background job did not finish"
+    qapp.processEvents()
+
+
+def names(window):
+    return [window.file_model.name(row) for row in range(window.file_model.rowCount())]
+
+
+def test_warm_open_shows_database_rows_then_picks_up_changes(qapp, folder):
+    first = app.FileEditorApp()
+    first.open_folder(str(folder), interactive=False)
+    wait_for_job(qapp, first)
+    first.project_db_action.trigger()  # Create the project database
+    wait_for_job(qapp, first)
+    first.close()
+    first.project_db.close()
+
+    (folder / "img12.txt").write_text("added while closed")
+    window = app.FileEditorApp()
+    window.open_folder(str(folder), interactive=False)
+
+    # Rows come from the database before the folder has been checked
+    assert window.file_model.database is not None
+    assert names(window) == [f"img{index}.txt" for index in range(12)]
+    assert window.current_file == str(folder / "img0.txt")
+
+    wait_for_job(qapp, window)
+    assert window.file_model.database is None
+    assert names(window) == [f"img{index}.txt" for index in range(13)]
+    assert window.current_file_name() == "img0.txt"
+    window.close()
+    window.project_db.close()
+
+
+def test_filter_and_sort_keep_the_selection(qapp, folder):
+    window = app.FileEditorApp()
+    window.open_folder(str(folder), interactive=False)
+    wait_for_job(qapp, window)
+
+    window.select_names({"img3.txt", "img4.txt"}, "img3.txt")
+    window.filter_entry.setText("dog")
+    assert names(window) == [f"img{index}.txt" for index in range(1, 12, 2)]
+    assert window.selected_file_names() == ["img3.txt"]
+    assert window.current_file == str(folder / "img3.txt")
+
+    window.file_list.horizontalHeader().setSortIndicator(0, Qt.DescendingOrder)
+    assert names(window)[0] == "img11.txt"
+    assert window.selected_file_names() == ["img3.txt"]
+
+    window.select_all_visible()
+    assert len(window.selected_file_names()) == 6
+    window.close()
@@ -0,0 +1,23 @@
+"""Lint rules"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+@pytest.mark.parametrize("trigger, caption, missing", [
+    ("ohwx", "ohwx, cat", False),
+    ("ohwx", "a photo of OHWX man", False),
+    ("ohwx", "ohwxman, cat", True),
+    ("ohwx", "cat, not_ohwx", True),
+    ("ohwx man", "ohwx man, smiling", False),
+    ("<lora:x>", "<lora:x>, cat", False),
+    ("", "anything", False),
+])
+def test_missing_trigger_matches_whole_words(trigger, caption, missing):
+    context = {'trigger': trigger, 'max_words': app.LINT_MAX_WORDS}
+    assert ('missing_trigger' in app.lint_caption(caption.encode(), ['missing_trigger'], context)) == missing
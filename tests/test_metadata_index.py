@@ -0,0 +1,68 @@
+"""ImageMetadataIndex filter parsing and matching"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+@pytest.mark.parametrize("filter_text", ["format=jpg", "format=JPG", "format=jpeg"])
+def test_jpg_filter_matches_jpeg_images(filter_text):
+    index = app.ImageMetadataIndex()
+    clauses = index.parse_filter(filter_text)
+    assert index.matches({'format': 'JPEG'}, clauses)
+    assert not index.matches({'format': 'PNG'}, clauses)
+
+
+def test_size_filter_accepts_suffixes():
+    index = app.ImageMetadataIndex()
+    clauses = index.parse_filter("size>2mb width<512")
+    assert index.matches({'file_size': 3 * 1024 ** 2, 'width': 300}, clauses)
+    assert not index.matches({'file_size': 1024 ** 2, 'width': 300}, clauses)
+
+
+def test_unknown_key_is_rejected():
+    with pytest.raises(ValueError, match="Unknown filter key"):
+        app.ImageMetadataIndex().parse_filter("foo<3")
+
+
+def test_refresh_reads_through_the_file_system_and_reuses_unchanged_entries(tmp_path):
+    from PIL import Image
+    Image.new('RGB', (64, 48)).save(tmp_path / "a.jpg")
+    (tmp_path / "a.txt").write_text("a cat")
+    (tmp_path / "b.txt").write_text("no image")
+
+    fs = app.LatencyFileSystem(latency=0)
+    index = app.ImageMetadataIndex(fs=fs)
+    changed = index.refresh(str(tmp_path))
+    assert changed == {"a.txt": "a cat", "b.txt": "no image"}
+    assert index.entries["a.txt"]['width'] == 64 and index.entries["a.txt"]['format'] == 'JPEG'
+    # One listing, one header read and two caption reads
+    assert fs.calls == 4
+
+    fs.calls = 0
+    assert index.refresh(str(tmp_path)) == {}
+    assert fs.calls == 1
+
+
+def test_natural_sort_key_orders_like_people_and_like_sqlite(tmp_path):
+    names = ["img10.txt", "img2.txt", "IMG1.txt", "img02a.txt", "img", "img1", "img!", "b9.txt", "b010.txt", "a.txt"]
+    expected = ["a.txt", "b9.txt", "b010.txt", "img", "img1", "IMG1.txt", "img2.txt", "img02a.txt", "img10.txt", "img!"]
+    assert sorted(names, key=app.natural_sort_key) == expected
+
+    # The stored keys give the same order when the project database sorts them
+    database = app.ProjectDatabase(str(tmp_path))
+    database.connection.executemany("INSERT INTO files (name, sort_key) VALUES (?, ?)",
+                                    [(name, app.natural_sort_key(name)) for name in names])
+    assert [name for _, name in database.sorted_rows('sort_key')] == expected
+    database.close()
+
+
+def test_network_folders_keep_the_rollback_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "is_network_filesystem", lambda path: True)
+    database = app.ProjectDatabase(str(tmp_path))
+    assert database.connection.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    database.close()
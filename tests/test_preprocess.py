@@ -0,0 +1,61 @@
+"""Bucketing and resizing of single images, run in-process"""
+import os
+import stat
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+BUCKETS = app.make_buckets(1024)
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    source, output = tmp_path / "source", tmp_path / "output"
+    source.mkdir()
+    output.mkdir()
+    return source, output
+
+
+def preprocess(dirs, name, image, mode='crop'):
+    source, output = dirs
+    image.save(source / name)
+    (source / (os.path.splitext(name)[0] + ".txt")).write_text("a caption")
+    image_name, bucket, error = app.preprocess_image(str(source), str(output), name,
+                                                     os.path.splitext(name)[0] + ".txt", BUCKETS, mode)
+    assert error is None
+    return Image.open(output / name), bucket
+
+
+@pytest.mark.parametrize("image", [
+    Image.new('P', (1600, 1200)),
+    Image.new('I;16', (1600, 1200), 40000),
+    Image.new('LA', (1600, 1200)),
+], ids=['palette', '16-bit', 'grayscale-alpha'])
+def test_unusual_modes_are_resized(dirs, image):
+    result, bucket = preprocess(dirs, "image.png", image)
+    assert result.size == bucket
+    assert result.mode in ('RGB', 'RGBA', 'L')
+
+
+def test_16_bit_is_scaled_not_clipped(dirs):
+    result, _ = preprocess(dirs, "image.png", Image.new('I;16', (1600, 1200), 32768))
+    assert result.getextrema() == (128, 128)
+
+
+@pytest.mark.parametrize("mode", ['crop', 'fit'])
+def test_small_images_are_not_upscaled(dirs, mode):
+    result, _ = preprocess(dirs, "small.jpg", Image.new('RGB', (300, 200)), mode)
+    assert result.width <= 300 and result.height <= 200
+
+
+def test_output_files_get_normal_permissions(dirs):
+    preprocess(dirs, "image.jpg", Image.new('RGB', (1600, 1200)))
+    _, output = dirs
+    expected = 0o666 & ~app.UMASK
+    for name in ("image.jpg", "image.txt"):
+        assert stat.S_IMODE(os.stat(output / name).st_mode) == expected
@@ -0,0 +1,81 @@
+"""SnapshotStore: rolling back renames when some of them fail, and pruning"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+class FailingRenames(app.LocalFileSystem):
+    """Fails renames for which fails(source name, destination name) is true"""
+
+    def __init__(self, fails):
+        self.fails = fails
+
+    def rename(self, source, destination):
+        if self.fails(os.path.basename(source), os.path.basename(destination)):
+            raise OSError(f"cannot rename {os.path.basename(source)}")
+        super().rename(source, destination)
+
+
+@pytest.fixture
+def renamed(tmp_path):
+    """A folder whose a/b/c captions were renamed to new_a/new_b/new_c, with the snapshot of that rename"""
+    store = app.SnapshotStore(str(tmp_path))
+    snapshot = store.begin("rename_files", "new")
+    for name in "abc":
+        (tmp_path / f"new_{name}.txt").write_text(name)
+        snapshot.add_rename(f"{name}.txt", f"new_{name}.txt")
+    return store, snapshot.save()
+
+
+def listing(folder):
+    return sorted(name for name in os.listdir(folder) if not name.startswith(".caption"))
+
+
+@pytest.mark.parametrize("fails", [
+    lambda source, destination: source == "new_b.txt",  # to the temporary name
+    lambda source, destination: destination == "b.txt",  # from the temporary name to the final one
+], ids=["temporary", "final"])
+def test_failed_rename_leaves_the_file_where_it_was(tmp_path, renamed, fails):
+    store, snapshot_id = renamed
+    file_io = app.FileIO(FailingRenames(fails))
+
+    result = store.restore(snapshot_id, file_io=file_io)
+
+    assert [name for name, _ in result['errors']] == ["new_b.txt"]
+    assert listing(tmp_path) == ["a.txt", "c.txt", "new_b.txt"]
+    assert (tmp_path / "a.txt").read_text() == "a" and (tmp_path / "new_b.txt").read_text() == "b"
+
+    # The rollback's own snapshot holds exactly the renames that happened
+    store.restore(result['snapshot_id'])
+    assert listing(tmp_path) == ["new_a.txt", "new_b.txt", "new_c.txt"]
+
+
+def test_file_stuck_under_its_temporary_name_can_be_recovered(tmp_path, renamed):
+    store, snapshot_id = renamed
+    file_io = app.FileIO(FailingRenames(lambda source, destination: source.startswith(".rollback_")
+                                        and source.endswith("_b.txt")))
+
+    result = store.restore(snapshot_id, file_io=file_io)
+    stuck = [name for name in listing(tmp_path) if name.startswith(".rollback_")]
+    assert len(stuck) == 1 and result['snapshot_id']
+
+    store.restore(result['snapshot_id'])
+    assert listing(tmp_path) == ["new_a.txt", "new_b.txt", "new_c.txt"]
+
+
+def test_stray_files_in_the_store_do_not_break_saving(tmp_path):
+    store = app.SnapshotStore(str(tmp_path))
+    snapshot = store.begin("replace_in_all")
+    snapshot.add_caption("a.txt", b"old caption")
+    with open(os.path.join(store.blob_dir, ".DS_Store"), "wb") as file:
+        file.write(b"finder")
+
+    assert snapshot.save()
+    assert os.path.exists(os.path.join(store.blob_dir, ".DS_Store"))
+    assert [manifest['captions'] for manifest in store.list_manifests()] == [
+        {"a.txt": app.hashlib.sha256(b"old caption").hexdigest()}]